@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""parse_api_xml のベンチマーク
+
+合成したJ-STAGE検索APIのレスポンス（既定1万件）で、旧実装（正規表現）と
+現在の1パスのパーサーを比較する。
+
+    python bench/bench_parse_api.py [--entries 10000] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fetch_data import parse_api_xml
+from records import to_dict
+from store import ARTICLE_KEYS
+
+
+def legacy_parse_api_xml(xml):
+    """旧実装（split + 項目ごとのre.search）。比較のため件数の打ち切りだけ外してある"""
+    articles = []
+    entries = xml.split("<entry>")
+    
+    for entry in entries[1:]:
+        entry = entry.split("</entry>")[0]
+        
+        # タイトル
+        title = ""
+        m = re.search(r'article_title[\s\S]*?<ja>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
+        if m:
+            title = m.group(1).strip()
+        if not title:
+            m = re.search(r'article_title[\s\S]*?<en>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
+            if m:
+                title = m.group(1).strip()
+        if not title:
+            m = re.search(r'<title>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
+            if m and not m.group(1).startswith("http"):
+                title = m.group(1).strip()
+        
+        if not title:
+            continue
+        
+        # 著者
+        authors = []
+        author_match = re.search(r'<author>([\s\S]*?)</author>', entry)
+        if author_match:
+            author_block = author_match.group(1)
+            ja_block = re.search(r'<ja>([\s\S]*?)</ja>', author_block)
+            if ja_block:
+                names = re.findall(r'CDATA\[([\s\S]*?)\]\]', ja_block.group(1))
+                authors = [n.strip() for n in names if n.strip()]
+            else:
+                en_block = re.search(r'<en>([\s\S]*?)</en>', author_block)
+                if en_block:
+                    names = re.findall(r'CDATA\[([\s\S]*?)\]\]', en_block.group(1))
+                    authors = [n.strip() for n in names if n.strip()]
+        
+        # 巻号年
+        vol = re.search(r'volume>(\d+)<', entry)
+        num = re.search(r'number>([^<]+)<', entry)
+        year = re.search(r'pubyear>(\d+)<', entry)
+        link = re.search(r'link[^>]*href="([^"]+)"', entry)
+        
+        articles.append({
+            "title": title,
+            "authors": authors[:5],
+            "volume": vol.group(1) if vol else "",
+            "number": num.group(1) if num else "",
+            "year": year.group(1) if year else "",
+            "link": link.group(1) if link else "",
+        })
+    
+    return articles
+
+
+def make_api_response(n):
+    """J-STAGE検索API（service=3）の形式でn件のレスポンスを合成する"""
+    entries = []
+    for i in range(n):
+        vol = 60 + i % 8
+        num = 1 + i % 6
+        entries.append(f"""<entry>
+<article_title><en><![CDATA[Study {i} on occupational stress and workplace health]]></en><ja><![CDATA[職場におけるストレスと健康に関する研究 その{i}]]></ja></article_title>
+<article_link><en>https://www.jstage.jst.go.jp/article/sangyoeisei/{vol}/{num}/{vol}_{i}/_article/-char/en</en><ja>https://www.jstage.jst.go.jp/article/sangyoeisei/{vol}/{num}/{vol}_{i}/_article/-char/ja/</ja></article_link>
+<author><en><name><![CDATA[Taro Yamada]]></name><name><![CDATA[Hanako Suzuki]]></name><name><![CDATA[Ichiro Sato]]></name></en><ja><name><![CDATA[山田 太郎]]></name><name><![CDATA[鈴木 花子]]></name><name><![CDATA[佐藤 一郎]]></name></ja></author>
+<cdjournal>sangyoeisei</cdjournal>
+<material_title><en><![CDATA[SANGYO EISEIGAKU ZASSHI]]></en><ja><![CDATA[産業衛生学雑誌]]></ja></material_title>
+<prism:issn>1341-0725</prism:issn>
+<prism:volume>{vol}</prism:volume>
+<prism:number>{num}</prism:number>
+<prism:startingPage>{i % 90 + 1}</prism:startingPage>
+<prism:endingPage>{i % 90 + 9}</prism:endingPage>
+<pubyear>{1958 + vol}</pubyear>
+<prism:doi>10.1539/sangyoeisei.{vol}_{i}</prism:doi>
+<title><![CDATA[職場におけるストレスと健康に関する研究 その{i}]]></title>
+<link href="https://www.jstage.jst.go.jp/article/sangyoeisei/{vol}/{num}/{vol}_{i}/_article/-char/ja/"/>
+<id>https://www.jstage.jst.go.jp/article/sangyoeisei/{vol}/{num}/{vol}_{i}/_article/-char/ja/</id>
+<updated>2025-01-10</updated>
+</entry>""")
+    return ("""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" xmlns:prism="http://prismstandard.org/namespaces/basic/2.0/">
+<result><status>0</status><message/></result>
+<title><![CDATA[J-STAGE API]]></title>
+<link href="https://api.jstage.jst.go.jp/searchapi/do"/>
+<opensearch:totalResults>%d</opensearch:totalResults>
+%s
+</feed>""" % (n, "\n".join(entries)))
+
+
+def best_of(func, xml, repeat):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = func(xml)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parse_api_xml のベンチマーク")
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    xml = make_api_response(args.entries)
+    print(f"{args.entries}件 / {len(xml.encode('utf-8')) / 1e6:.1f} MB")
+    
+    legacy_time, legacy = best_of(legacy_parse_api_xml, xml, args.repeat)
+    new_time, new = best_of(parse_api_xml, xml, args.repeat)
+    
+    print(f"  旧実装 (正規表現)  : {legacy_time:.3f} s  ({args.entries / legacy_time:,.0f} 件/s)")
+    print(f"  parse_api_xml     : {new_time:.3f} s  ({args.entries / new_time:,.0f} 件/s)")
+    print(f"  速度比            : x{legacy_time / new_time:.1f}")
+    
+    # 旧実装は dict を返すので、レコードを data.json と同じ形の dict にして比べる
+    if legacy != [to_dict(a, ARTICLE_KEYS) for a in new]:
+        print("  結果が一致しません")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""ベンチマーク用のデータ
+
+bench/fixtures/ に記録したJ-STAGEのRSS・検索API・厚労省RDFのレスポンスを元に、
+項目を繰り返して任意の件数のレスポンスやサイトのデータを合成する。
+繰り返した項目はリンクを書き換えて別の記事・ニュースにする。
+"""
+import os
+import random
+import re
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# 現在のサイトの規模（scale=1）: 6誌 × 最新5件、ニュース10件
+ARTICLES_PER_JOURNAL = 5
+NEWS_ITEMS = 10
+
+_ITEM_RE = re.compile(r"<item\b.*?</item>", re.S)
+_ENTRY_RE = re.compile(r"<entry>.*?</entry>", re.S)
+_ARTICLE_LINK_RE = re.compile(r"(https://www\.jstage\.jst\.go\.jp/article/[^\"<]+?)/_article")
+_NEWS_LINK_RE = re.compile(r"(https://www\.mhlw\.go\.jp/stf/[^\"<]+?)\.html")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _repeat_items(text, item_re, link_re, n):
+    """text の項目を n 件になるまで繰り返す（2周目以降はリンクに番号を付ける）"""
+    items = item_re.findall(text)
+    head = text[:text.index(items[0])]
+    tail = text[text.rindex(items[-1]) + len(items[-1]):]
+    out = []
+    for i in range(n):
+        item = items[i % len(items)]
+        if i >= len(items):
+            item = link_re.sub(lambda m: f"{m.group(1)}-{i}" + m.group(0)[len(m.group(1)):], item)
+        out.append(item)
+    return head + "\n".join(out) + tail
+
+
+def jstage_rss(n):
+    """J-STAGEの雑誌RSS（n件）"""
+    return _repeat_items(fixture("jstage_rss.xml"), _ITEM_RE, _ARTICLE_LINK_RE, n)
+
+
+def jstage_api(n):
+    """J-STAGE検索API（service=3）のレスポンス（n件）"""
+    text = _repeat_items(fixture("jstage_api.xml"), _ENTRY_RE, _ARTICLE_LINK_RE, n)
+    text = re.sub(r"<opensearch:totalResults>\d+", f"<opensearch:totalResults>{n}", text)
+    return re.sub(r"<opensearch:itemsPerPage>\d+", f"<opensearch:itemsPerPage>{n}", text)
+
+
+def mhlw_news(n):
+    """厚労省の新着情報RDF（n件）"""
+    return _repeat_items(fixture("mhlw_news.rdf"), _ITEM_RE, _NEWS_LINK_RE, n)
+
+
+def site_data(scale):
+    """build_html.load_data() と同じ形（レコード）で、記事とニュースを scale 倍にしたデータ"""
+    import fetch_data
+    import store
+
+    data = store.load_json(os.path.join(ROOT_DIR, "data.json"))
+    n = ARTICLES_PER_JOURNAL * scale
+    journals = []
+    for j in data["journals"]:
+        base = j.articles or fetch_data.parse_journal_rss(jstage_rss(ARTICLES_PER_JOURNAL))
+        journals.append(j._replace(articles=tuple(
+            a._replace(link=a.link.replace("/_article", f"-{i}/_article")) if i >= len(base) else a
+            for i in range(n) for a in [base[i % len(base)]]
+        )))
+    data["journals"] = journals
+    news = fetch_data.parse_news_rss(mhlw_news(NEWS_ITEMS * scale), NEWS_ITEMS * scale)
+    data["news"] = [item._replace(source="厚生労働省 新着情報") for item in news]
+    return data
+
+
+def archive_articles(scale):
+    """蓄積した記事アーカイブに見立てた (雑誌ID, 記事) の列（各誌 ARTICLES_PER_JOURNAL × scale 件）
+
+    タイトルはフィクスチャのタイトルの断片をつなぎ合わせて1件ずつ変え、リンクも記事ごとに変える。
+    """
+    import fetch_data
+
+    base = fetch_data.parse_api_xml(jstage_api(ARTICLES_PER_JOURNAL))
+    pieces = [a.title[i:i + 6] for a in base for i in range(0, len(a.title), 6)]
+    rnd = random.Random(scale)
+    out = []
+    for j in fetch_data.JOURNALS:
+        for i in range(ARTICLES_PER_JOURNAL * scale):
+            link = f"https://www.jstage.jst.go.jp/article/{j.id}/{i // 100}/1/{i // 100}_{i}/_article/-char/ja/"
+            out.append((j.id, base[i % len(base)]._replace(title="".join(rnd.sample(pieces, 6)), link=link)))
+    return out
+
+
+def search_entries(data):
+    """search_index.build_index() に渡す (雑誌名, 記事) の列"""
+    return [(j.name, a) for j in data["journals"] for a in j.articles]
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""取得・生成パイプラインのベンチマーク
+
+記録したフィクスチャ（bench/fixtures/）を現在のサイトの規模の scale 倍に増やし、
+段階ごとにスループット、所要時間のパーセンタイル、ピークメモリ（tracemalloc）を測る。
+取得の段階はフィクスチャを返すローカルのHTTPサーバー（bench/server.py）に対して行う。
+bench/baseline.json と比べて遅く・重くなっていれば終了コード1で終わる。
+
+所要時間はマシンによって何倍も違うので、秒のままでは比べない。段階を1回動かすごとに、
+このリポジトリのコードを使わない決まった処理（reference()）も動かし、その何倍かかったかで
+基準と比べる。基準を記録したマシンと違うマシンでも、同じマシンの別の時間帯でも比べられる。
+物差しは段階を1回動かすごとに同じくらいの時間動かし、その直前の段階との比の中央値を倍率にする。
+
+    python bench/run.py [--scales 10,100,1000] [--stages parse_api,render] [--repeat 5]
+    python bench/run.py --update-baseline   # 今回の結果を基準として保存する
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import build_html
+import fetch_data
+import search_index
+import store
+
+import corpus
+from server import FixtureServer
+
+BASELINE_PATH = os.path.join(corpus.BENCH_DIR, "baseline.json")
+
+
+# 段階ごとに、測る関数と処理件数を yield する（入力の用意は測らない）
+
+@contextmanager
+def stage_parse_rss(scale):
+    n = corpus.ARTICLES_PER_JOURNAL * scale
+    xml = corpus.jstage_rss(n).encode("utf-8")
+    yield lambda: fetch_data.parse_journal_rss(xml, n), n
+
+
+@contextmanager
+def stage_parse_api(scale):
+    n = corpus.ARTICLES_PER_JOURNAL * scale
+    xml = corpus.jstage_api(n)
+    yield lambda: fetch_data.parse_api_xml(xml), n
+
+
+@contextmanager
+def stage_news_filter(scale):
+    n = corpus.NEWS_ITEMS * scale
+    entries = fetch_data.parse_news_rss(corpus.mhlw_news(n), n)
+    yield lambda: fetch_data.filter_news(entries, "厚生労働省 新着情報"), n
+
+
+@contextmanager
+def stage_fetch(scale):
+    """全誌のRSSと厚労省RDFを、ローカルのサーバーからHTTPで取得して解析する"""
+    n = corpus.ARTICLES_PER_JOURNAL * scale
+    news = corpus.NEWS_ITEMS * scale
+    rss = corpus.jstage_rss(n)
+    routes = {f"www.jstage.jst.go.jp/browse/{j.id}/-char/ja/rss": rss for j in fetch_data.JOURNALS}
+    routes.update({urlkey(feed.url): corpus.mhlw_news(news) for feed in fetch_data.RSS_FEEDS})
+
+    def run():
+        for j in fetch_data.JOURNALS:
+            fetch_data.fetch_journal_rss(j.id, n)
+        fetch_data.fetch_rss()
+
+    saved = fetch_data.CACHE_DIR, fetch_data.MAX_ITEMS_PER_FEED
+    fetch_data.CACHE_DIR, fetch_data.MAX_ITEMS_PER_FEED = None, news
+    try:
+        with FixtureServer(routes) as server, server.routing(fetch_data.CLIENT):
+            yield run, n * len(fetch_data.JOURNALS) + news * len(fetch_data.RSS_FEEDS)
+    finally:
+        fetch_data.CACHE_DIR, fetch_data.MAX_ITEMS_PER_FEED = saved
+
+
+@contextmanager
+def stage_render(scale):
+    """トップ・制度改正・最新記事・雑誌一覧・検索の各ページ"""
+    data = corpus.site_data(scale)
+    generators = [generate for generate, _ in build_html.pages(data).values()]
+
+    def run():
+        build_html.ROWS.clear()
+        for generate in generators:
+            generate(data)
+
+    yield run, sum(len(j.articles) for j in data["journals"])
+
+
+@contextmanager
+def stage_render_archive(scale):
+    """記事アーカイブの一覧ページと記事ページ（ファイルには書かない）"""
+    data = corpus.site_data(scale)
+
+    def run():
+        build_html.ROWS.clear()
+        for j in data["journals"]:
+            rows = [(build_html.article_slug(a.link), a) for a in j.articles]
+            chunks = list(build_html._chunks(rows, build_html.ARCHIVE_PAGE_SIZE))
+            for page, chunk in enumerate(chunks, 1):
+                build_html.generate_archive_listing(j, chunk, page, len(chunks), [])
+                for slug, a in chunk:
+                    build_html.generate_article_page(j, slug, a)
+
+    yield run, sum(len(j.articles) for j in data["journals"])
+
+
+@contextmanager
+def stage_search_index(scale):
+    data = corpus.site_data(scale)
+    entries = corpus.search_entries(data)
+    thesaurus = build_html.load_thesaurus()
+    yield lambda: search_index.build_shards(entries, thesaurus), len(entries)
+
+
+@contextmanager
+def stage_dedup(scale):
+    """アーカイブをストアに入れてから、リンクの形だけ違う同じ記事（全件）と、
+    記事IDの取れないリンクでタイトルが少し違う同じ記事（10件に1件）をまとめる"""
+    articles = corpus.archive_articles(scale)
+    variants = [(jid, a._replace(link=a.link.replace("/-char/ja/", "/-char/en/"))) for jid, a in articles]
+    variants += [(jid, a._replace(link=f"https://example.org/{i}", title=a.title[:-1]))
+                 for i, (jid, a) in enumerate(articles) if i % 10 == 0]
+
+    def run():
+        conn = store.connect(":memory:")
+        store.upsert_journals(conn, fetch_data.JOURNALS)
+        for rows in (articles, variants):
+            for j in fetch_data.JOURNALS:
+                store.upsert_articles(conn, j.id, [a for jid, a in rows if jid == j.id])
+        conn.close()
+
+    yield run, len(articles) + len(variants)
+
+
+STAGES = {
+    "parse_rss": stage_parse_rss,
+    "parse_api": stage_parse_api,
+    "news_filter": stage_news_filter,
+    "fetch": stage_fetch,
+    "render": stage_render,
+    "render_archive": stage_render_archive,
+    "search_index": stage_search_index,
+    "dedup": stage_dedup,
+}
+
+
+_REFERENCE_WORDS = [f"語{i:04d}" for i in range(500)]
+_REFERENCE_RE = re.compile(r"語(\d+)")
+
+
+def reference():
+    """時間の物差しにする処理（文字列・dict・正規表現・JSON・並べ替え。リポジトリのコードは使わない）"""
+    rnd = random.Random(0)
+    rows = [{"title": " ".join(rnd.sample(_REFERENCE_WORDS, 8)), "n": i} for i in range(500)]
+    text = json.dumps(rows, ensure_ascii=False)
+    rows = json.loads(text)
+    rows.sort(key=lambda row: row["title"])
+    return sum(len(_REFERENCE_RE.sub(r"<\1>", row["title"])) for row in rows)
+
+
+def urlkey(url):
+    """FixtureServer の表のキー（ホスト名/パス）"""
+    return url.split("://", 1)[1].split("?", 1)[0]
+
+
+def percentile(values, p):
+    """最近傍順位法のパーセンタイル"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(stage, scale, repeat):
+    with STAGES[stage](scale) as (run, items):
+        run()  # 1回目はキャッシュやimportの影響があるので捨てる
+        reference()
+        times = []
+        ref_times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t)
+            # 続けて物差しの処理を段階と同じくらいの時間（3回以上）動かし、1回あたりを出す。
+            # マシンの速さは数十msの単位で揺れるので、短い1回だけでは揺れをそのまま拾う
+            n = 0
+            t = time.perf_counter()
+            while n < 3 or time.perf_counter() - t < times[-1]:
+                reference()
+                n += 1
+            ref_times.append((time.perf_counter() - t) / n)
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    p50 = percentile(times, 50)
+    return {
+        "items": items,
+        "p50": p50,
+        "ref": percentile(ref_times, 50),
+        # 直後に測った物差しとの比の中央値
+        "relative": percentile([t / ref for t, ref in zip(times, ref_times)], 50),
+        "p90": percentile(times, 90),
+        "p99": percentile(times, 99),
+        "throughput": items / p50 if p50 else 0,
+        "peak_kb": peak // 1024,
+    }
+
+
+def regressions(results, baseline, tolerance, memory_tolerance):
+    """基準より遅い・重い結果の説明（所要時間は物差しの処理の何倍かで比べる）"""
+    out = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        # ごく短い処理は揺れが大きいので、割合に加えて2ms分（今回の物差しで換算）までは許す
+        if "relative" in base and r["relative"] > base["relative"] * (1 + tolerance) + 0.002 / r["ref"]:
+            out.append(f"{key}: 物差しの {base['relative']:.2f}倍 -> {r['relative']:.2f}倍"
+                       f"（p50 {base['p50'] * 1000:.1f} ms -> {r['p50'] * 1000:.1f} ms）")
+        if r["peak_kb"] > base["peak_kb"] * (1 + memory_tolerance) + 64:
+            out.append(f"{key}: peak {base['peak_kb']:,} KB -> {r['peak_kb']:,} KB")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取得・生成パイプラインのベンチマーク")
+    parser.add_argument("--scales", default="10,100,1000", help="現在の規模の何倍で測るか（カンマ区切り）")
+    parser.add_argument("--stages", default=",".join(STAGES), help="測る段階（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="p50 がこの割合を超えて遅くなったら失敗")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="ピークメモリがこの割合を超えて増えたら失敗")
+    parser.add_argument("--update-baseline", action="store_true", help="結果を bench/baseline.json に保存する")
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    stages = args.stages.split(",")
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage: {stage}（{', '.join(STAGES)}）")
+
+    print(f"{'stage':<16}{'scale':>7}{'items':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'x ref':>8}{'items/s':>12}{'peak KB':>10}")
+    results = {}
+    for stage in stages:
+        for scale in scales:
+            r = results[f"{stage}@{scale}x"] = measure(stage, scale, args.repeat)
+            print(f"{stage:<16}{scale:>6}x{r['items']:>9,}{r['p50'] * 1000:>10.1f}{r['p90'] * 1000:>10.1f}"
+                  f"{r['p99'] * 1000:>10.1f}{r['relative']:>8.2f}{r['throughput']:>12,.0f}{r['peak_kb']:>10,}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update({key: {"p50": round(r["p50"], 6), "relative": round(r["relative"], 4), "peak_kb": r["peak_kb"]}
+                         for key, r in results.items()})
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved: {BASELINE_PATH}")
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        print("baseline がありません（--update-baseline で作成）")
+        return
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+    found = regressions(results, baseline, args.tolerance, args.memory_tolerance)
+    if found:
+        print("REGRESSION")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+    print("baseline と比べて劣化なし")
+
+
+if __name__ == "__main__":
+    main()
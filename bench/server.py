@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""フィクスチャを返すローカルのHTTPサーバー
+
+J-STAGEや厚労省の代わりに、"ホスト名/パス" -> 本文 の表から応答する。ETag を付け、
+If-None-Match が一致すれば 304 を返す。keep-alive で応答し、Accept-Encoding に gzip が
+あれば圧縮して返す。routing() の間は fetch_data.CLIENT からの https:// のリクエストが
+このサーバーに向く。
+
+    with FixtureServer({"www.mhlw.go.jp/stf/news.rdf": body}) as server, server.routing(fetch_data.CLIENT):
+        fetch_data.fetch_rss()
+"""
+import gzip
+import hashlib
+import socket
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # ヘッダーと本文を別々に書くので、Nagle で keep-alive の2回目以降が遅れないようにする
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+
+    def do_GET(self):
+        key = urllib.parse.urlsplit(self.path).path.lstrip("/")
+        body = self.server.routes.get(key)
+        self.server.requests += 1
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.server.gzipped(key)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    def __init__(self, routes):
+        self.routes = {key: body.encode("utf-8") if isinstance(body, str) else body for key, body in routes.items()}
+
+    def __enter__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.routes = self.routes
+        self.httpd.requests = 0
+        self.httpd.connections = 0
+        self.httpd.gzipped = self._gzipped
+        self._compressed = {}
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _gzipped(self, key):
+        if key not in self._compressed:
+            self._compressed[key] = gzip.compress(self.routes[key], mtime=0)
+        return self._compressed[key]
+
+    @property
+    def base(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def connections(self):
+        """受け付けた接続の数（keep-alive が効いていれば requests より少ない）"""
+        return self.httpd.connections
+
+    def rewrite(self, url):
+        """https://ホスト/パス -> http://127.0.0.1:ポート/ホスト/パス"""
+        parts = urllib.parse.urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.base}/{parts.netloc}{parts.path}{query}"
+
+    @contextmanager
+    def routing(self, client):
+        """この間だけ client（http_client.Client）のリクエストをこのサーバーに向ける"""
+        saved = client.rewrite
+        client.rewrite = self.rewrite
+        try:
+            yield self
+        finally:
+            client.rewrite = saved
+            client.close()
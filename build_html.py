@@ -1,5 +1,25 @@
 #!/usr/bin/env python3
+import argparse
+import gzip
+import hashlib
+import inspect
 import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from html import escape
+
+import metrics
+import search_index
+import store
+from template import FragmentCache, Template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 LINKS = [
     {"name": "厚生労働省 職場の安全サイト", "url": "https://anzeninfo.mhlw.go.jp/", "desc": "労働安全衛生に関する情報ポータル", "icon": "building"},
@@ -23,6 +43,21 @@ ICONS = {
     "external": '<path d="M18 13v6a2 2 0 01-2 2H5a2 2 0 01-2-2V8a2 2 0 012-2h6M15 3h6v6M10 14L21 3"/>',
 }
 
+# CSSやアイコンは assets/ に内容のハッシュ入りの名前で書き出し、ページからは参照だけする
+ASSET_DIR = "assets"
+
+def asset_path(name, text, ext):
+    """assets/<name>.<ハッシュ>.<ext>（サイトのルートから）"""
+    return f"{ASSET_DIR}/{name}.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}.{ext}"
+
+# ICONS を1つにまとめたSVGスプライト
+ICON_SPRITE = (
+    '<svg xmlns="http://www.w3.org/2000/svg">'
+    + "".join(f'<symbol id="{name}" viewBox="0 0 24 24">{path}</symbol>' for name, path in ICONS.items())
+    + "</svg>"
+)
+ICON_SPRITE_PATH = asset_path("icons", ICON_SPRITE, "svg")
+
 COMMON_HEAD = '''<meta charset="UTF-8">
   <meta name="viewport" content="width=device-width, initial-scale=1.0">
   <link rel="preconnect" href="https://fonts.googleapis.com">
@@ -94,9 +129,7 @@ HEADER_HTML = '''<header>
     <div class="header-inner">
       <a href="index.html" class="logo">
         <div class="logo-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-            <path d="M12 6.253v13m0-13C10.832 5.477 9.246 5 7.5 5S4.168 5.477 3 6.253v13C4.168 18.477 5.754 18 7.5 18s3.332.477 4.5 1.253m0-13C13.168 5.477 14.754 5 16.5 5c1.747 0 3.332.477 4.5 1.253v13C19.832 18.477 18.247 18 16.5 18c-1.746 0-3.332.477-4.5 1.253"/>
-          </svg>
+          {logo}
         </div>
         SANPO PORTAL
       </a>
@@ -109,23 +142,152 @@ HEADER_HTML = '''<header>
     </div>
   </header>'''
 
+@lru_cache(maxsize=None)
+def icon(name, cls="", size=None):
+    """アイコンのSVG
+
+    スプライトへの <use href> の方が短いアイコンは参照にし、矢印のように
+    パスの方が短いものはそのまま埋め込む。
+    """
+    if name not in ICONS:
+        name = "file"
+    attrs = f' class="{cls}"' if cls else ""
+    if size:
+        attrs += f' width="{size}" height="{size}"'
+    body = f'<use href="{ICON_SPRITE_PATH}#{name}"/>'
+    if len(ICONS[name]) <= len(body):
+        body = ICONS[name]
+    return f'<svg{attrs} viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{body}</svg>'
+
+@lru_cache(maxsize=None)
+def header(active=""):
+    """HEADER_HTML（active のメニューを強調）"""
+    return HEADER_HTML.format(logo=icon("book"), **{
+        f"{page}_active": ' class="active"' if page == active else ""
+        for page in ("seido", "articles", "journals", "search")
+    })
+
+# 一覧の行（アイコンは作るときに埋め込む）
+INDEX_ROW = Template('''
+        <a href="{href}" target="_blank" class="article-row">
+          <span class="article-num">{num}</span>
+          <span class="article-title">{title}</span>
+          <span class="article-meta">{issue}</span>
+          {arrow}
+        </a>''', arrow=icon("arrow", "article-arrow", 16))
+
+LINK_CARD = Template('''
+      <a href="{url}" target="_blank" class="link-card">
+        <div class="link-icon">
+          {icon}
+        </div>
+        <div class="link-content">
+          <h3>{name}</h3>
+          <p>{desc}</p>
+        </div>
+        {arrow}
+      </a>''', arrow=icon("external", "link-arrow", 18))
+
+NEWS_ITEM = Template('''
+        <a href="{link}" target="_blank" class="news-item" data-keywords="{keywords}">
+          <span class="news-date">{date}</span>
+          <span class="news-title">{title}</span>
+          <span class="news-tags">{tags}</span>
+          {arrow}
+        </a>''', arrow=icon("arrow", "news-arrow", 16))
+
+NEWS_TAG = Template('''<span class="news-tag">{keyword}</span>''')
+
+NEWS_FACET = Template('''
+        <button type="button" class="news-facet" data-keyword="{keyword}">{keyword}<span>{count}</span></button>''')
+
+ARTICLE_ITEM = Template('''
+          <a href="{href}"{target} class="article-item">
+            <div class="article-title">{title}</div>
+            <div class="article-meta">{meta}</div>
+          </a>''')
+
+JOURNAL_SECTION = Template('''
+    <div class="journal-section">
+      <div class="journal-header">
+        <div class="journal-icon">
+          {book}
+        </div>
+        <div>
+          <h2><a href="{url}" target="_blank">{name}</a></h2>
+          <p class="publisher">{publisher}</p>
+        </div>
+      </div>
+      <div class="article-list">{articles}
+      </div>
+    </div>''', book=icon("book"))
+
+JOURNAL_CARD = Template('''
+    <div class="journal-card">
+      <div class="journal-card-icon" style="background: {color}">
+        {book}
+      </div>
+      <div class="journal-card-content">
+        <h2><a href="{archive}">{name}</a></h2>
+        <p class="publisher">{publisher}</p>
+        <p class="description">{desc}</p>
+      </div>
+      <a href="{url}" target="_blank" class="journal-link">
+        J-STAGEで開く
+        {external}
+      </a>
+    </div>''', book=icon("book"), external=icon("external"))
+
+VOLUME_LINK = Template('''
+        <a href="{href}"{active}>{label}</a>''')
+
+TEMPLATES = (INDEX_ROW, LINK_CARD, NEWS_ITEM, NEWS_TAG, NEWS_FACET, ARTICLE_ITEM, JOURNAL_SECTION, JOURNAL_CARD, VOLUME_LINK)
+
+# 描画済みの記事の行（同じ記事を複数の一覧で使い回す）
+ROWS = FragmentCache()
+
+def article_key(a):
+    """記事の行の中身が同じかどうかを決める値"""
+    return (a.link, a.title, a.authors, a.year, a.volume, a.number)
+
+def html_article(a):
+    """HTMLに書く記事（文字列の項目をエスケープしたもの）
+
+    ページを作るときに記事1件につき1回通し、テンプレートに差し込むたびにはエスケープしない。
+    エスケープの要る文字を含む記事はまれなので、含まなければ a をそのまま返す。
+    """
+    text = "".join([a.title, a.link, a.volume, a.number, a.year, *a.authors])
+    if "&" not in text and "<" not in text and ">" not in text and '"' not in text and "'" not in text:
+        return a
+    return a._replace(title=escape(a.title), authors=tuple(map(escape, a.authors)), volume=escape(a.volume),
+                      number=escape(a.number), year=escape(a.year), link=escape(a.link))
+
+@lru_cache(maxsize=1024)
+def escape_label(text):
+    """何度も書く短いテキスト（雑誌名・巻など）のエスケープ"""
+    return escape(text)
+
+def article_meta(a):
+    """著者（3人まで）/ 発行年・巻号"""
+    authors = ", ".join(a.authors[:3])
+    if len(a.authors) > 3:
+        authors += " 他"
+    issue = f'{a.year}年 {a.volume}巻{a.number}号' if a.year else ""
+    return " / ".join(filter(None, [authors, issue]))
+
+def article_item(h, href=None, target=""):
+    """記事の行（h は html_article() を通した記事。href を省くと記事のリンク）"""
+    return ARTICLE_ITEM.render(href=href or h.link or "#", target=target, title=h.title, meta=article_meta(h))
+
 def generate_index(data):
-    all_articles = []
-    for j in data["journals"]:
-        for a in j.get("articles", [])[:2]:
-            all_articles.append({**a, "journal": j["name"]})
-    all_articles.sort(key=lambda x: (x.get("year", ""), x.get("volume", "")), reverse=True)
+    all_articles = [a for j in data["journals"] for a in j.articles[:2]]
+    all_articles.sort(key=lambda a: (a.year, a.volume), reverse=True)
     
-    quick_links = ""
-    for i, a in enumerate(all_articles[:5]):
-        issue = f'{a["year"]}年 {a["volume"]}巻' if a.get("year") and a.get("volume") else ""
-        quick_links += f'''
-        <a href="{a.get('link', 'articles.html')}" target="_blank" class="article-row">
-          <span class="article-num">{str(i+1).zfill(2)}</span>
-          <span class="article-title">{a["title"]}</span>
-          <span class="article-meta">{issue}</span>
-          <svg class="article-arrow" width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
-        </a>'''
+    quick_links = INDEX_ROW.render_each(
+        {"href": a.link or "articles.html", "num": str(i+1).zfill(2), "title": a.title,
+         "issue": f'{a.year}年 {a.volume}巻' if a.year and a.volume else ""}
+        for i, a in enumerate(map(html_article, all_articles[:5]))
+    )
     
     if not quick_links:
         quick_links = '<div class="empty">データ取得中...</div>'
@@ -315,7 +477,7 @@ def generate_index(data):
   </style>
 </head>
 <body>
-  {HEADER_HTML.format(seido_active="", articles_active="", journals_active="", search_active="")}
+  {header()}
   <main>
     <section class="hero">
       <div class="hero-badge">産業保健専門ポータル</div>
@@ -326,42 +488,42 @@ def generate_index(data):
     <div class="cards">
       <a href="seido.html" class="card">
         <div class="card-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["file"]}</svg>
+          {icon("file")}
         </div>
         <h2>制度改正</h2>
         <p>法令・ガイドラインの<br>最新改正情報</p>
         <div class="card-arrow">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
+          {icon("arrow")}
         </div>
       </a>
       <a href="articles.html" class="card">
         <div class="card-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["book"]}</svg>
+          {icon("book")}
         </div>
         <h2>最新記事</h2>
         <p>各学術誌の<br>最新論文</p>
         <div class="card-arrow">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
+          {icon("arrow")}
         </div>
       </a>
       <a href="journals.html" class="card">
         <div class="card-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["database"]}</svg>
+          {icon("database")}
         </div>
         <h2>雑誌一覧</h2>
         <p>J-STAGE無料閲覧<br>可能な学術誌</p>
         <div class="card-arrow">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
+          {icon("arrow")}
         </div>
       </a>
       <a href="search.html" class="card">
         <div class="card-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["search"]}</svg>
+          {icon("search")}
         </div>
         <h2>キーワード検索</h2>
         <p>類義語シソーラスで<br>論文を横断検索</p>
         <div class="card-arrow">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
+          {icon("arrow")}
         </div>
       </a>
     </div>
@@ -383,35 +545,33 @@ def generate_index(data):
 </html>'''
 
 def generate_seido(data):
-    links_html = ""
-    for link in LINKS:
-        icon = ICONS.get(link.get("icon", "file"), ICONS["file"])
-        links_html += f'''
-      <a href="{link['url']}" target="_blank" class="link-card">
-        <div class="link-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{icon}</svg>
-        </div>
-        <div class="link-content">
-          <h3>{link['name']}</h3>
-          <p>{link['desc']}</p>
-        </div>
-        <svg class="link-arrow" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["external"]}</svg>
-      </a>'''
+    links_html = LINK_CARD.render_each({**link, "icon": icon(link.get("icon", "file"))} for link in LINKS)
     
     # ニュースセクション
-    news_html = ""
-    news_items = data.get("news", [])
+    news_items = data["news"]
     if news_items:
-        for item in news_items:
-            news_html += f'''
-        <a href="{item.get('link', '#')}" target="_blank" class="news-item">
-          <span class="news-date">{item.get('date', '')}</span>
-          <span class="news-title">{item.get('title', '')}</span>
-          <svg class="news-arrow" width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["arrow"]}</svg>
-        </a>'''
+        news_html = NEWS_ITEM.render_each(
+            {"link": escape(item.link or "#"), "date": escape(item.date), "title": escape(item.title),
+             "keywords": escape("|".join(item.keywords)),
+             "tags": NEWS_TAG.render_each({"keyword": escape(kw)} for kw in item.keywords)}
+            for item in news_items
+        )
     else:
         news_html = '<div class="news-empty">新着情報はありません</div>'
     
+    # キーワードで絞り込むボタン（多い順）
+    counts = {}
+    for item in news_items:
+        for kw in item.keywords:
+            counts[kw] = counts.get(kw, 0) + 1
+    facets_html = NEWS_FACET.render_each(
+        {"keyword": escape(kw), "count": n} for kw, n in sorted(counts.items(), key=lambda kv: -kv[1])
+    )
+    if facets_html:
+        facets_html = f'''
+      <div class="news-facets">{facets_html}
+      </div>'''
+    
     return f'''<!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -458,7 +618,7 @@ def generate_seido(data):
     }}
     .news-item {{
       display: grid;
-      grid-template-columns: 90px 1fr auto;
+      grid-template-columns: 90px 1fr auto auto;
       align-items: center;
       gap: 16px;
       padding: 16px 24px;
@@ -469,6 +629,7 @@ def generate_seido(data):
     }}
     .news-item:last-child {{ border-bottom: none; }}
     .news-item:hover {{ background: white; }}
+    .news-item[hidden] {{ display: none; }}
     .news-date {{
       font-size: 0.75rem;
       color: var(--text-light);
@@ -483,6 +644,46 @@ def generate_seido(data):
       white-space: nowrap;
     }}
     .news-item:hover .news-title {{ color: var(--accent-1); }}
+    .news-tags {{
+      display: flex;
+      gap: 6px;
+    }}
+    .news-tag {{
+      font-size: 0.7rem;
+      color: var(--text-muted);
+      background: var(--border-light);
+      border-radius: 6px;
+      padding: 2px 8px;
+      white-space: nowrap;
+    }}
+    .news-facets {{
+      display: flex;
+      flex-wrap: wrap;
+      gap: 8px;
+      margin-bottom: 16px;
+    }}
+    .news-facet {{
+      font: inherit;
+      font-size: 0.8rem;
+      color: var(--text-muted);
+      background: var(--bg-secondary);
+      border: none;
+      border-radius: 999px;
+      padding: 6px 14px;
+      cursor: pointer;
+    }}
+    .news-facet span {{
+      margin-left: 6px;
+      color: var(--text-light);
+    }}
+    .news-facet.active {{
+      color: white;
+      background: var(--accent-1);
+    }}
+    .news-facet.active span {{ color: inherit; }}
+    @media (max-width: 768px) {{
+      .news-tags {{ display: none; }}
+    }}
     .news-arrow {{
       color: var(--text-light);
       transition: all 0.2s;
@@ -532,7 +733,7 @@ def generate_seido(data):
   </style>
 </head>
 <body>
-  {HEADER_HTML.format(seido_active=' class="active"', articles_active="", journals_active="", search_active="")}
+  {header("seido")}
   <main>
     <div class="page-header">
       <h1>制度改正・法令情報</h1>
@@ -540,7 +741,7 @@ def generate_seido(data):
     </div>
     
     <section class="news-section">
-      <div class="section-title">厚労省 新着情報（産業保健関連）</div>
+      <div class="section-title">厚労省 新着情報（産業保健関連）</div>{facets_html}
       <div class="news-list">{news_html}
       </div>
     </section>
@@ -549,43 +750,35 @@ def generate_seido(data):
     <div class="link-list">{links_html}
     </div>
   </main>
+  
+  <script>
+    // キーワードのボタンでニュースを絞り込む（もう一度押すと解除）
+    document.querySelectorAll('.news-facet').forEach(button => {{
+      button.addEventListener('click', () => {{
+        const keyword = button.classList.contains('active') ? null : button.dataset.keyword;
+        document.querySelectorAll('.news-facet').forEach(b => b.classList.toggle('active', b === button && keyword !== null));
+        document.querySelectorAll('.news-item').forEach(item => {{
+          item.hidden = keyword !== null && !item.dataset.keywords.split('|').includes(keyword);
+        }});
+      }});
+    }});
+  </script>
 </body>
 </html>'''
 
 def generate_articles(data):
-    journals_html = ""
+    sections = []
     for j in data["journals"]:
-        articles_html = ""
-        if j.get("articles"):
-            for a in j["articles"]:
-                authors = ", ".join(a.get("authors", [])[:3])
-                if len(a.get("authors", [])) > 3:
-                    authors += " 他"
-                issue = f'{a["year"]}年 {a["volume"]}巻{a.get("number", "")}号' if a.get("year") else ""
-                meta = " / ".join(filter(None, [authors, issue]))
-                link = a.get("link", "#")
-                articles_html += f'''
-          <a href="{link}" target="_blank" class="article-item">
-            <div class="article-title">{a["title"]}</div>
-            <div class="article-meta">{meta}</div>
-          </a>'''
+        if j.articles:
+            articles_html = "".join([
+                ROWS.get(("articles", article_key(a)), lambda a=a: article_item(html_article(a), target=' target="_blank"'))
+                for a in j.articles
+            ])
         else:
             articles_html = '<div class="article-item empty">データなし</div>'
-        
-        journals_html += f'''
-    <div class="journal-section">
-      <div class="journal-header">
-        <div class="journal-icon">
-          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["book"]}</svg>
-        </div>
-        <div>
-          <h2><a href="{j['url']}" target="_blank">{j['name']}</a></h2>
-          <p class="publisher">{j['publisher']}</p>
-        </div>
-      </div>
-      <div class="article-list">{articles_html}
-      </div>
-    </div>'''
+        sections.append({"url": escape_label(j.url), "name": escape_label(j.name), "publisher": escape_label(j.publisher),
+                         "articles": articles_html})
+    journals_html = JOURNAL_SECTION.render_each(sections)
     
     return f'''<!DOCTYPE html>
 <html lang="ja">
@@ -655,7 +848,7 @@ def generate_articles(data):
   </style>
 </head>
 <body>
-  {HEADER_HTML.format(seido_active="", articles_active=' class="active"', journals_active="", search_active="")}
+  {header("articles")}
   <main>
     <div class="page-header">
       <h1>最新記事</h1>
@@ -677,24 +870,11 @@ def generate_journals(data):
         "linear-gradient(135deg, #8b5cf6 0%, #a855f7 100%)",
     ]
     
-    journals_html = ""
-    for i, j in enumerate(data["journals"]):
-        color = colors[i % len(colors)]
-        journals_html += f'''
-    <div class="journal-card">
-      <div class="journal-card-icon" style="background: {color}">
-        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["book"]}</svg>
-      </div>
-      <div class="journal-card-content">
-        <h2><a href="{j['url']}" target="_blank">{j['name']}</a></h2>
-        <p class="publisher">{j['publisher']}</p>
-        <p class="description">{j.get('desc', '')}</p>
-      </div>
-      <a href="{j['url']}" target="_blank" class="journal-link">
-        J-STAGEで開く
-        <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">{ICONS["external"]}</svg>
-      </a>
-    </div>'''
+    journals_html = JOURNAL_CARD.render_each(
+        {"color": colors[i % len(colors)], "archive": archive_url(j.id), "name": escape_label(j.name),
+         "publisher": escape_label(j.publisher), "desc": escape(j.desc), "url": escape_label(j.url)}
+        for i, j in enumerate(data["journals"])
+    )
     
     return f'''<!DOCTYPE html>
 <html lang="ja">
@@ -769,7 +949,7 @@ def generate_journals(data):
   </style>
 </head>
 <body>
-  {HEADER_HTML.format(seido_active="", articles_active="", journals_active=' class="active"', search_active="")}
+  {header("journals")}
   <main>
     <div class="page-header">
       <h1>雑誌一覧</h1>
@@ -781,28 +961,42 @@ def generate_journals(data):
 </body>
 </html>'''
 
-def generate_search(data):
-    # thesaurus.jsonを読み込む
+def search_entries(data):
+    """検索対象の (雑誌名, 記事) 列（ストアがあれば蓄積した全記事、なければdata.jsonの最新記事）"""
+    journal_names = {j.id: j.name for j in data["journals"]}
+    if os.path.exists(store.DB_PATH):
+        conn = store.connect()
+        for journal_id, a in store.iter_articles(conn):
+            yield journal_names.get(journal_id, ""), a
+        conn.close()
+    else:
+        for j in data["journals"]:
+            for a in j.articles:
+                yield j.name, a
+
+def load_thesaurus():
     try:
         with open("thesaurus.json", encoding="utf-8") as f:
-            thesaurus = json.load(f)
+            return json.load(f)
     except:
-        thesaurus = {}
-    
-    # JavaScriptに渡すデータ
-    articles_js = []
-    for j in data["journals"]:
-        for a in j.get("articles", []):
-            articles_js.append({
-                "title": a.get("title", ""),
-                "authors": a.get("authors", []),
-                "journal": j["name"],
-                "year": a.get("year", ""),
-                "volume": a.get("volume", ""),
-                "number": a.get("number", ""),
-                "link": a.get("link", "")
-            })
-    
+        return {}
+
+def write_search_index(data):
+    """search.html が読み込む分割インデックス（search/）を書き出す"""
+    manifest = search_index.write_shards(search_entries(data), load_thesaurus(), write=publish_file)
+    # 書き直さなかった分割ファイルの圧縮版も COMPRESSED に合わせる（足りなければ置き、要らなければ消す）
+    shard_dir = os.path.join(search_index.SEARCH_DIR, search_index.SHARD_DIR)
+    for name in os.listdir(shard_dir):
+        path = os.path.join(shard_dir, name)
+        if _uncompressed(path) == path and not _compressed_ok(path):
+            with open(path, "rb") as f:
+                precompress(path, f.read())
+    # 分割前の一括インデックスが残っていれば消す
+    if os.path.exists("search-index.json"):
+        os.remove("search-index.json")
+    return manifest
+
+def generate_search(data):
     return f'''<!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -977,7 +1171,7 @@ def generate_search(data):
   </style>
 </head>
 <body>
-  {HEADER_HTML.format(seido_active="", articles_active="", journals_active="", search_active=' class="active"')}
+  {header("search")}
   <main>
     <div class="page-header">
       <h1>キーワード検索</h1>
@@ -1013,57 +1207,155 @@ def generate_search(data):
   </main>
   
   <script>
-    const articles = {json.dumps(articles_js, ensure_ascii=False)};
-    const thesaurus = {json.dumps(thesaurus, ensure_ascii=False)};
-    
     const searchInput = document.getElementById('searchInput');
     const synonymsInfo = document.getElementById('synonymsInfo');
     
+    // 転置インデックス（gram -> 記事番号）は build_html.py が search/ に分割して書き出す。
+    // manifest.json だけを毎回確かめ、分割ファイルは検索に必要な分だけ読む
+    const SEARCH_DIR = 'search/';
+    let manifest = null;
+    const files = new Map();
+    const postingsCache = new Map();
+    const textCache = new Map();
+    
+    function loadManifest() {{
+      if (!manifest) {{
+        manifest = fetch(SEARCH_DIR + 'manifest.json', {{ cache: 'no-cache' }}).then(r => r.json());
+      }}
+      return manifest;
+    }}
+    
+    function loadShard(name) {{
+      if (!files.has(name)) {{
+        files.set(name, fetch(SEARCH_DIR + 'shards/' + name).then(r => r.json()));
+      }}
+      return files.get(name);
+    }}
+    
+    // search_index.gram_shard() と同じ振り分け
+    function gramShard(gram, shards) {{
+      let h = 0;
+      for (const ch of gram) h = (h * 31 + ch.codePointAt(0)) >>> 0;
+      return h % shards;
+    }}
+    
+    // 記事番号の記事が入った分割ファイルを読み、記事番号 -> 記事 を返す
+    async function loadDocs(ids) {{
+      const m = await loadManifest();
+      const shardIds = [...new Set(ids.map(id => Math.floor(id / m.docShardSize)))];
+      const shards = await Promise.all(shardIds.map(i => loadShard(m.docShards[i])));
+      const docs = new Map();
+      shardIds.forEach((i, k) => {{
+        for (const id of ids) {{
+          if (Math.floor(id / m.docShardSize) === i) docs.set(id, shards[k][id - i * m.docShardSize]);
+        }}
+      }});
+      return docs;
+    }}
+    
     searchInput.addEventListener('keypress', (e) => {{
       if (e.key === 'Enter') doSearch();
     }});
     
-    function getSynonyms(keyword) {{
-      const kw = keyword.toLowerCase();
-      let synonyms = [keyword];
-      
-      // 完全一致でシソーラスを検索
-      for (const [key, values] of Object.entries(thesaurus)) {{
-        if (key.toLowerCase() === kw || key.toLowerCase().includes(kw)) {{
-          synonyms = synonyms.concat(values);
-          synonyms.push(key);
+    // search_index.normalize() と同じ正規化
+    function normalize(s) {{
+      return s.normalize('NFKC').toLowerCase();
+    }}
+    
+    function docText(id, d) {{
+      if (!textCache.has(id)) {{
+        textCache.set(id, normalize(d[0] + ' ' + d[1].join(' ')));
+      }}
+      return textCache.get(id);
+    }}
+    
+    // 差分符号化されたポスティングを記事番号の昇順リストに戻す
+    async function postings(gram) {{
+      if (!postingsCache.has(gram)) {{
+        const m = await loadManifest();
+        const shard = await loadShard(m.gramShards[gramShard(gram, m.gramShards.length)]);
+        const ids = [];
+        let id = 0;
+        for (const d of shard[gram] || []) {{
+          id += d;
+          ids.push(id);
         }}
-        // 値にも含まれているかチェック
-        for (const v of values) {{
-          if (v.toLowerCase() === kw || v.toLowerCase().includes(kw)) {{
-            synonyms = synonyms.concat(values);
-            synonyms.push(key);
-            break;
-          }}
+        postingsCache.set(gram, ids);
+      }}
+      return postingsCache.get(gram);
+    }}
+    
+    function intersect(a, b) {{
+      const out = [];
+      let i = 0, j = 0;
+      while (i < a.length && j < b.length) {{
+        if (a[i] === b[j]) {{ out.push(a[i]); i++; j++; }}
+        else if (a[i] < b[j]) i++;
+        else j++;
+      }}
+      return out;
+    }}
+    
+    // 1語を検索して 記事番号 -> 記事 を返す
+    async function lookup(term) {{
+      const chars = [...normalize(term)];
+      const t = chars.join('');
+      if (!t) return new Map();
+      let ids;
+      if (chars.length < 2) {{
+        // 1文字はunigramのポスティングそのもの
+        ids = await postings(t);
+      }} else {{
+        const grams = new Set();
+        for (let i = 0; i < chars.length - 1; i++) grams.add(chars[i] + chars[i + 1]);
+        const lists = (await Promise.all([...grams].map(postings))).sort((a, b) => a.length - b.length);
+        ids = lists[0];
+        for (const list of lists.slice(1)) {{
+          if (!ids.length) break;
+          ids = intersect(ids, list);
         }}
       }}
-      
+      // bigramが揃っても連続していないことがあるので部分一致で確かめる
+      const docs = await loadDocs(ids);
+      for (const [id, d] of docs) {{
+        if (!docText(id, d).includes(t)) docs.delete(id);
+      }}
+      return docs;
+    }}
+    
+    // シソーラスは類義語検索のときだけ読む。search_index.compile_thesaurus() が
+    // 語の一部 -> 類義語グループの表にしてあるので、1回引くだけで展開できる
+    async function getSynonyms(keyword) {{
+      const thesaurus = await loadShard((await loadManifest()).thesaurus);
+      let synonyms = [keyword];
+      for (const gid of thesaurus.expand[normalize(keyword)] || []) {{
+        synonyms = synonyms.concat(thesaurus.groups[gid]);
+      }}
       return [...new Set(synonyms)];
     }}
     
+    function escapeHtml(text) {{
+      return String(text).replace(/[&<>"']/g, c => ({{ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }})[c]);
+    }}
+    
+    // キーワードの部分を <mark> で囲む（区切った部分ごとにエスケープする）
     function highlightText(text, keywords) {{
-      let result = text;
-      for (const kw of keywords) {{
-        const regex = new RegExp('(' + kw.replace(/[.*+?^${{}}()|[\\]\\\\]/g, '\\\\$&') + ')', 'gi');
-        result = result.replace(regex, '<mark>$1</mark>');
-      }}
-      return result;
+      const terms = keywords.filter(kw => kw).map(kw => kw.replace(/[.*+?^${{}}()|[\\]\\\\]/g, '\\\\$&'));
+      if (!terms.length) return escapeHtml(text);
+      const regex = new RegExp('(' + terms.join('|') + ')', 'gi');
+      return text.split(regex).map((part, i) => i % 2 ? `<mark>${{escapeHtml(part)}}</mark>` : escapeHtml(part)).join('');
     }}
     
-    function doSearch() {{
+    async function doSearch() {{
       const keyword = searchInput.value.trim();
       if (!keyword) return;
+      const m = await loadManifest();
       
       const mode = document.querySelector('input[name="searchMode"]:checked').value;
       let searchTerms = [keyword];
       
       if (mode === 'synonym') {{
-        searchTerms = getSynonyms(keyword);
+        searchTerms = await getSynonyms(keyword);
         if (searchTerms.length > 1) {{
           synonymsInfo.innerHTML = '🔍 検索語: ' + searchTerms.join(', ');
           synonymsInfo.classList.add('show');
@@ -1074,9 +1366,13 @@ def generate_search(data):
         synonymsInfo.classList.remove('show');
       }}
       
-      const results = articles.filter(article => {{
-        const text = (article.title + ' ' + article.authors.join(' ')).toLowerCase();
-        return searchTerms.some(term => text.includes(term.toLowerCase()));
+      const docs = new Map();
+      for (const found of await Promise.all(searchTerms.map(lookup))) {{
+        for (const [id, d] of found) docs.set(id, d);
+      }}
+      const results = [...docs.keys()].sort((a, b) => a - b).map(id => {{
+        const d = docs.get(id);
+        return {{ title: d[0], authors: d[1], journal: m.journals[d[2]], year: d[3], volume: d[4], number: d[5], link: d[6] }};
       }});
       
       renderResults(results, searchTerms);
@@ -1103,14 +1399,14 @@ def generate_search(data):
       
       for (const r of results) {{
         const title = highlightText(r.title, keywords);
-        const authors = r.authors.slice(0, 3).join(', ') + (r.authors.length > 3 ? ' 他' : '');
-        const issue = r.year ? `${{r.year}}年 ${{r.volume}}巻${{r.number}}号` : '';
+        const authors = escapeHtml(r.authors.slice(0, 3).join(', ') + (r.authors.length > 3 ? ' 他' : ''));
+        const issue = r.year ? escapeHtml(`${{r.year}}年 ${{r.volume}}巻${{r.number}}号`) : '';
         
         html += `
-          <a href="${{r.link}}" target="_blank" class="result-item">
+          <a href="${{escapeHtml(r.link)}}" target="_blank" class="result-item">
             <div class="result-title">${{title}}</div>
             <div class="result-meta">
-              <span class="result-journal">${{r.journal}}</span>
+              <span class="result-journal">${{escapeHtml(r.journal)}}</span>
               ${{authors}}${{issue ? ' / ' + issue : ''}}
             </div>
           </a>
@@ -1123,26 +1419,605 @@ def generate_search(data):
 </body>
 </html>'''
 
-def main():
-    with open("data.json", encoding="utf-8") as f:
-        data = json.load(f)
+# 記事アーカイブ（archive/<雑誌ID>/ 以下）
+ARCHIVE_DIR = "archive"
+ARCHIVE_PAGE_SIZE = 50
+
+ARCHIVE_STYLE = '''
+    .page-header { padding: 40px 0 32px; }
+    .page-header h1 { font-size: clamp(1.5rem, 3vw, 2.25rem); font-weight: 700; letter-spacing: -0.02em; margin-bottom: 12px; }
+    .page-header p { font-size: 0.95rem; color: var(--text-muted); }
+    .crumbs { font-size: 0.8rem; margin-bottom: 16px; }
+    .crumbs a { color: var(--text-muted); text-decoration: none; }
+    .crumbs a:hover { color: var(--accent-1); }
+    .volumes { display: flex; flex-wrap: wrap; gap: 8px; margin-bottom: 32px; }
+    .volumes a { font-size: 0.8rem; padding: 6px 12px; border-radius: 8px; background: var(--bg-secondary); color: var(--text-muted); text-decoration: none; }
+    .volumes a:hover, .volumes a.active { color: var(--accent-1); background: white; box-shadow: 0 1px 3px rgba(0,0,0,0.06); }
+    .article-list { display: grid; gap: 2px; background: var(--bg-secondary); border-radius: 20px; padding: 16px; }
+    .article-item { display: block; padding: 16px 20px; background: white; border-radius: 10px; text-decoration: none; color: inherit; transition: all 0.2s; }
+    .article-item:hover { box-shadow: 0 2px 12px rgba(0,0,0,0.04); transform: translateX(4px); }
+    .article-title { font-size: 0.9rem; font-weight: 450; margin-bottom: 6px; color: var(--text); }
+    .article-item:hover .article-title { color: var(--accent-1); }
+    .article-meta { font-size: 0.8rem; color: var(--text-muted); }
+    .empty { text-align: center; color: var(--text-light); padding: 20px; }
+    .pager { display: flex; flex-wrap: wrap; justify-content: center; gap: 6px; margin-top: 32px; font-size: 0.85rem; }
+    .pager a, .pager span { min-width: 36px; padding: 6px 10px; text-align: center; border-radius: 8px; color: var(--text-muted); text-decoration: none; }
+    .pager a:hover { color: var(--accent-1); background: var(--bg-secondary); }
+    .pager .current { color: white; background: var(--accent-1); }
+    .journal-link { display: inline-flex; align-items: center; gap: 6px; padding: 10px 16px; background: var(--bg-secondary); border-radius: 10px; font-size: 0.85rem; font-weight: 500; color: var(--text-muted); text-decoration: none; }
+    .journal-link:hover { color: var(--accent-1); }
+    .journal-link svg { width: 14px; height: 14px; }
+'''
+
+_ARTICLE_PATH_RE = re.compile(r"/article/[^/]+/(.+?)/_article")
+
+def _slug(text):
+    return re.sub(r"[^0-9A-Za-z_.-]+", "-", text).strip("-")
+
+def article_slug(link):
+    """記事ページのファイル名（J-STAGEのリンクの巻/号/記事コードから。取れなければリンクのハッシュ）"""
+    m = _ARTICLE_PATH_RE.search(link)
+    if m and _slug(m.group(1)):
+        return _slug(m.group(1))
+    return hashlib.sha1(link.encode("utf-8")).hexdigest()[:12]
+
+def archive_url(journal_id, page=1, volume=None):
+    """一覧ページのパス（サイトのルートから）"""
+    name = f"vol-{_slug(volume)}" if volume else "index"
+    if page > 1:
+        name = f"{name}-{page}" if volume else f"page-{page}"
+    return f"{ARCHIVE_DIR}/{journal_id}/{name}.html"
+
+def article_url(journal_id, slug):
+    return f"{ARCHIVE_DIR}/{journal_id}/a/{slug}.html"
+
+def journal_articles(data, journal_id, volume=None):
+    """雑誌（巻を指定したらその巻）の記事を順に（ストアがあれば蓄積した全記事、なければdata.jsonの最新記事）"""
+    if os.path.exists(store.DB_PATH):
+        conn = store.connect()
+        for _, a in store.iter_articles(conn, journal_id, volume):
+            yield a
+        conn.close()
+    else:
+        articles = next((j.articles for j in data["journals"] if j.id == journal_id), ())
+        if volume is None:
+            yield from articles
+        else:
+            yield from [a for a in articles if a.volume == volume]
+
+def journal_volumes(data, journal_id):
+    """雑誌の記事数と [(巻, 件数), ...]"""
+    if os.path.exists(store.DB_PATH):
+        conn = store.connect()
+        total, vols = store.count_articles(conn, journal_id), store.volumes(conn, journal_id)
+        conn.close()
+        return total, vols
+    articles = next((j.articles for j in data["journals"] if j.id == journal_id), ())
+    counts = {}
+    for a in articles:
+        if a.volume:
+            counts[a.volume] = counts.get(a.volume, 0) + 1
+    return len(articles), sorted(counts.items(), key=lambda v: (int(v[0]) if v[0].isdigit() else 0, v[0]), reverse=True)
+
+def _chunks(items, size):
+    """イテレータを size 件ずつのリストに区切る"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def archive_pager(journal_id, page, pages, volume=None):
+    """前後2ページと最初・最後へのリンク"""
+    if pages <= 1:
+        return ""
+    links = []
+    prev = 0
+    for p in sorted({1, pages, *range(max(1, page - 2), min(pages, page + 2) + 1)}):
+        if p - prev > 1:
+            links.append("<span>…</span>")
+        if p == page:
+            links.append(f'<span class="current">{p}</span>')
+        else:
+            links.append(f'<a href="{archive_url(journal_id, p, volume)}">{p}</a>')
+        prev = p
+    return f'''
+    <div class="pager">{"".join(links)}</div>'''
+
+def generate_archive_listing(journal, articles, page, pages, volumes, volume=None):
+    """雑誌（または巻）の記事一覧の1ページ。articles は [(ファイル名, 記事), ...]"""
+    jid = journal.id
+    name = escape_label(journal.name)
+    heading = f'{name} 第{escape_label(volume)}巻' if volume else name
     
-    with open("index.html", "w", encoding="utf-8") as f:
-        f.write(generate_index(data))
+    # 同じ記事は雑誌の一覧と巻の一覧の両方に出るので、描いた行を使い回す
+    articles_html = "".join([
+        ROWS.get(("archive", jid, slug, article_key(a)),
+                 lambda slug=slug, a=a: article_item(html_article(a), article_url(jid, slug)))
+        for slug, a in articles
+    ])
+    if not articles_html:
+        articles_html = '''
+      <div class="empty">記事がありません</div>'''
     
-    with open("seido.html", "w", encoding="utf-8") as f:
-        f.write(generate_seido(data))
+    volumes_html = VOLUME_LINK.render_each(
+        [{"href": archive_url(jid), "active": ' class="active"' if volume is None else "", "label": "すべて"}]
+        + [{"href": archive_url(jid, volume=v), "active": ' class="active"' if v == volume else "", "label": f"{escape_label(v)}巻 ({n})"}
+           for v, n in volumes]
+    )
     
-    with open("articles.html", "w", encoding="utf-8") as f:
-        f.write(generate_articles(data))
+    return f'''<!DOCTYPE html>
+<html lang="ja">
+<head>
+  <base href="../../">
+  {COMMON_HEAD}
+  <title>{heading}{f" ({page}/{pages})" if pages > 1 else ""} - SANPO PORTAL</title>
+  <style>{COMMON_STYLE}{ARCHIVE_STYLE}</style>
+</head>
+<body>
+  {header("journals")}
+  <main>
+    <div class="page-header">
+      <p class="crumbs"><a href="journals.html">雑誌一覧</a>{f' / <a href="{archive_url(jid)}">{name}</a>' if volume else ""}</p>
+      <h1>{heading}</h1>
+      <p>{escape_label(journal.publisher)}</p>
+    </div>
+    <div class="volumes">{volumes_html}
+    </div>
+    <div class="article-list">{articles_html}
+    </div>{archive_pager(jid, page, pages, volume)}
+  </main>
+</body>
+</html>'''
+
+def generate_article_page(journal, slug, a):
+    """記事1件のページ"""
+    jid = journal.id
+    name = escape_label(journal.name)
+    h = html_article(a)
+    crumbs = f'<a href="{archive_url(jid)}">{name}</a>'
+    if a.volume:
+        crumbs += f' / <a href="{archive_url(jid, volume=a.volume)}">第{h.volume}巻</a>'
+    issue = f'{h.year}年 {h.volume}巻{h.number}号' if h.year else ""
     
-    with open("journals.html", "w", encoding="utf-8") as f:
-        f.write(generate_journals(data))
+    return f'''<!DOCTYPE html>
+<html lang="ja">
+<head>
+  <base href="../../../">
+  {COMMON_HEAD}
+  <title>{h.title} - {name} - SANPO PORTAL</title>
+  <style>{COMMON_STYLE}{ARCHIVE_STYLE}</style>
+</head>
+<body>
+  {header("journals")}
+  <main>
+    <div class="page-header">
+      <p class="crumbs">{crumbs}</p>
+      <h1>{h.title}</h1>
+      <p>{", ".join(h.authors)}</p>
+    </div>
+    <p class="article-meta">{" / ".join(filter(None, [name, issue]))}</p>
+    <p style="margin-top: 24px">
+      <a href="{h.link or "#"}" target="_blank" class="journal-link">
+        J-STAGEで読む
+        {icon("external")}
+      </a>
+    </p>
+  </main>
+</body>
+</html>'''
+
+def render_archive(journal, data):
+    """1誌分の記事ページと一覧ページを書き出す（ワーカープロセスで動く）
+
+    記事はストアから少しずつ読み、一覧の1ページ分（ARCHIVE_PAGE_SIZE件）だけを持つ。
+    内容が変わらないファイルは書き直さず、もう出てこないファイルは消す。
+    返り値は (ページ数, 書き直したページ数, 使ったアセット, 書き直したページのサイズの合計)。
+    """
+    jid = journal.id
+    total, volumes = journal_volumes(data, jid)
+    written = set()
+    changed = 0
+    renamed = {}
+    assets = set()
+    sizes = [0, 0, 0, 0, 0]
+    
+    def emit(path, text):
+        nonlocal changed
+        text, used = link_assets(text, "archive")
+        assets.update(used)
+        written.add(path)
+        page_sizes = publish(path, text)
+        if page_sizes:
+            changed += 1
+            page_sizes.append(sprite_savings(text))
+            sizes[:] = [total + (n or 0) for total, n in zip(sizes, page_sizes)]
+    
+    def slugged(articles):
+        for a in articles:
+            yield renamed.get(a.link) or article_slug(a.link), a
+    
+    pages = max(1, -(-total // ARCHIVE_PAGE_SIZE))
+    seen = set()
+    for page, chunk in enumerate(_chunks(slugged(journal_articles(data, jid)), ARCHIVE_PAGE_SIZE), 1):
+        for i, (slug, a) in enumerate(chunk):
+            if slug in seen:
+                # 同じファイル名になる記事があればリンクのハッシュを足して分ける
+                slug = renamed[a.link] = f'{slug}-{hashlib.sha1(a.link.encode("utf-8")).hexdigest()[:6]}'
+                chunk[i] = (slug, a)
+            seen.add(slug)
+            emit(article_url(jid, slug), generate_article_page(journal, slug, a))
+        emit(archive_url(jid, page), generate_archive_listing(journal, chunk, page, pages, volumes))
+    if not seen:
+        emit(archive_url(jid), generate_archive_listing(journal, [], 1, 1, volumes))
+    
+    for volume, n in volumes:
+        vol_pages = max(1, -(-n // ARCHIVE_PAGE_SIZE))
+        for page, chunk in enumerate(_chunks(slugged(journal_articles(data, jid, volume)), ARCHIVE_PAGE_SIZE), 1):
+            emit(archive_url(jid, page, volume),
+                 generate_archive_listing(journal, chunk, page, vol_pages, volumes, volume))
+    
+    for root, _, names in os.walk(os.path.join(ARCHIVE_DIR, jid)):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith((".html", ".gz", ".br")) and _uncompressed(path) not in written:
+                os.remove(path)
+    return len(written), changed, sorted(assets), sizes
+
+def load_data():
+    """ストアがあればそこから、なければdata.jsonからページ用のデータ（レコード）を読む"""
+    if os.path.exists(store.DB_PATH):
+        conn = store.connect()
+        data = store.export_data(conn)
+        conn.close()
+        return data
+    return store.load_json("data.json")
+
+# ページごとの入力の指紋（前回のビルド）を記録するファイル
+BUILD_MANIFEST = ".build-manifest.json"
+
+def fingerprint(*parts):
+    """入力をまとめたハッシュ（dictはキー順に並べてから）"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def pages(data):
+    """ページ -> (生成関数, 生成関数が読むデータ)
+
+    updated（最終更新日時）は毎回変わるので入れない。表示される日時は、そのページの
+    内容が最後に変わったときのものになる。
+    """
+    journal_meta = [j._replace(articles=()) for j in data["journals"]]
+    return {
+        "index.html": (generate_index, [[j.name, j.articles[:2]] for j in data["journals"]]),
+        "seido.html": (generate_seido, [LINKS, data["news"]]),
+        "articles.html": (generate_articles, [[j.name, j.url, j.publisher, j.articles] for j in data["journals"]]),
+        "journals.html": (generate_journals, journal_meta),
+        "search.html": (generate_search, None),
+    }
+
+def load_build_manifest():
+    try:
+        with open(BUILD_MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_build_manifest(manifest):
+    tmp = f"{BUILD_MANIFEST}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, BUILD_MANIFEST)
+
+def fingerprint_iter(items):
+    """イテレータの中身をまとめたハッシュ（全件をメモリに載せない）"""
+    h = hashlib.sha256()
+    for item in items:
+        h.update(json.dumps(item, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def write_file(path, text):
+    """一時ファイルに書いてから置き換える（途中で止まっても壊れたページを残さない）"""
+    # 同じアセットを複数のワーカーが同時に書くことがあるので、一時ファイルはプロセスごとに分ける
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if isinstance(text, bytes):
+        with open(tmp, "wb") as f:
+            f.write(text)
+    else:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+    os.replace(tmp, path)
+
+def write_if_changed(path, text):
+    """内容が変わったときだけ書き、書いたかどうかを返す"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_file(path, text)
+    return True
+
+_STYLE_RE = re.compile(r"<style>(.*?)</style>", re.S)
+
+@lru_cache(maxsize=None)
+def minify_css(css):
+    """コメントと余分な空白を落とす"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+@lru_cache(maxsize=None)
+def write_asset(name, text, ext):
+    """assets/<name>.<ハッシュ>.<ext> を書き（既にあれば何もしない）、サイトのルートからのパスを返す"""
+    path = asset_path(name, text, ext)
+    if not os.path.exists(path) or not _compressed_ok(path):
+        os.makedirs(ASSET_DIR, exist_ok=True)
+        publish_file(path, text)
+    return path
+
+def externalize_styles(html, name):
+    """<style> を共通CSS（COMMON_STYLE）とページごとのCSSのファイルにして <link> に置き換える
+
+    (HTML, 使ったアセットのパス) を返す。
+    """
+    assets = []
+    
+    def replace(m):
+        css = m.group(1)
+        links = []
+        if css.startswith(COMMON_STYLE):
+            links.append(write_asset("common", minify_css(COMMON_STYLE), "css"))
+            css = css[len(COMMON_STYLE):]
+        if css.strip():
+            links.append(write_asset(name, minify_css(css), "css"))
+        assets.extend(links)
+        return "\n  ".join(f'<link rel="stylesheet" href="{href}">' for href in links)
+    
+    return _STYLE_RE.sub(replace, html), assets
+
+_SCRIPT_RE = re.compile(r"(<script[^>]*>)(.*?)(</script>)", re.S)
+
+def minify_js(js):
+    """行頭の空白、空行、行全体のコメントを落とす（改行は残すのでセミコロンの自動挿入は変わらない）"""
+    lines = (line.strip() for line in js.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+def minify_html(html):
+    """テンプレートのインデントと空行を落とし、インラインのJS・CSSも縮める
+
+    改行は1つだけ残す（タグの間の空白は表示に影響することがあるので、空白ごと消しはしない）。
+    """
+    html = _SCRIPT_RE.sub(lambda m: m.group(1) + minify_js(m.group(2)) + m.group(3), html)
+    html = _STYLE_RE.sub(lambda m: f"<style>{minify_css(m.group(1))}</style>", html)
+    lines = (line.strip() for line in html.splitlines())
+    return "\n".join(line for line in lines if line)
+
+# 横に置く圧縮版の拡張子（build(precompress=True) / --precompress のときだけ置く）。
+# 圧縮済みファイルをそのまま返せる配信向けで、Netlify は使わずに自分で圧縮して返すので、
+# 既定では置かない（置くとコミットのたびに履歴が膨らむだけになる）
+COMPRESSED = ()
+
+def set_precompress(enabled):
+    """圧縮版を置くかを決める（ワーカープロセスでも initializer で呼ぶ）"""
+    global COMPRESSED
+    COMPRESSED = ((".gz", ".br") if brotli else (".gz",)) if enabled else ()
+
+def _uncompressed(path):
+    for ext in (".gz", ".br"):
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+def _compressed_ok(path):
+    """path の圧縮版が COMPRESSED のとおりか（足りないものも、置かないはずのものも無いか）"""
+    return all(os.path.exists(path + ext) == (ext in COMPRESSED) for ext in (".gz", ".br"))
+
+def precompress(path, data):
+    """COMPRESSED の圧縮版を横に置き、(gzip, brotli) のバイト数を返す
+
+    置かない圧縮版は（前に置いたものが残っていれば）消し、そのバイト数は None にする。
+    """
+    gz = br = None
+    if ".gz" in COMPRESSED:
+        gz = gzip.compress(data, 9, mtime=0)
+        write_file(path + ".gz", gz)
+    if ".br" in COMPRESSED:
+        br = brotli.compress(data, quality=11)
+        write_file(path + ".br", br)
+    for ext in (".gz", ".br"):
+        if ext not in COMPRESSED and os.path.exists(path + ext):
+            os.remove(path + ext)
+    return (None if gz is None else len(gz)), (None if br is None else len(br))
+
+def publish_file(path, text):
+    """テキストを書き、圧縮版（COMPRESSED）も置く"""
+    write_file(path, text)
+    precompress(path, text.encode("utf-8"))
+
+def publish(path, html):
+    """ページを縮めて書き、圧縮版（COMPRESSED）も置く
+
+    内容が変わらず圧縮版も COMPRESSED のとおりなら何もせず None、書いたら
+    [生成したまま, 縮小後, gzip, brotli] のバイト数（置かない圧縮版は None）を返す。
+    """
+    small = minify_html(html)
+    if not write_if_changed(path, small) and _compressed_ok(path):
+        return None
+    data = small.encode("utf-8")
+    return [len(html.encode("utf-8")), len(data), *precompress(path, data)]
+
+def link_assets(html, name):
+    """CSSを外に出し、アイコンのスプライトを参照していればそれも書く。(HTML, 使ったアセット) を返す"""
+    html, assets = externalize_styles(html, name)
+    if ICON_SPRITE_PATH in html:
+        assets.append(write_asset("icons", ICON_SPRITE, "svg"))
+    return html, assets
+
+_USE_RE = re.compile(r'<use href="[^"#]*#(\w+)"/>')
+
+def sprite_savings(html):
+    """スプライトを参照したことで減ったバイト数（パスを埋め込んだ場合との差）"""
+    return sum(len(ICONS[name].encode("utf-8")) - len(m.group(0).encode("utf-8"))
+               for m in _USE_RE.finditer(html) for name in [m.group(1)])
+
+# ページの書き出し手順（変えたら全ページ作り直す）
+def render_page(path, data):
+    """1ページを生成して書き出す（ワーカープロセスで動く）。(使ったアセット, サイズ) を返す"""
+    generate, _ = pages(data)[path]
+    html, assets = link_assets(generate(data), os.path.splitext(path)[0])
+    sizes = publish(path, html)
+    if sizes:
+        sizes.append(sprite_savings(html))
+    return assets, sizes
+
+def timed(func, *args):
+    """func(*args) を実行し、(秒数, 結果) を返す（ワーカープロセスでの生成時間を測る）"""
+    t = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - t, result
+
+def clean_assets(used):
+    """どのページからも参照されなくなったアセットを（圧縮版ごと）消す。置かない圧縮版も消す"""
+    if not os.path.isdir(ASSET_DIR):
+        return
+    for name in os.listdir(ASSET_DIR):
+        path = f"{ASSET_DIR}/{name}"
+        if _uncompressed(path) not in used or (_uncompressed(path) != path and not path.endswith(COMPRESSED)):
+            os.remove(path)
+
+def size_report(sizes):
+    """ページごとの 生成したまま -> 縮小後 (-> gzip -> brotli) のバイト数と、スプライトで減った分
+
+    gzip・brotli は圧縮版を置いたとき（COMPRESSED）だけ出す。
+    """
+    columns = "".join(f" -> {name}" for ext, name in ((".gz", "gzip"), (".br", "brotli")) if ext in COMPRESSED)
+    lines = [f"Sizes (bytes): raw -> minified{columns}, saved by icon sprite"]
+    width = max(len(label) for label in sizes)
+    for label, (raw, small, gz, br, sprite) in sizes.items():
+        row = f"  {label:<{width}}  {raw:>10,} -> {small:>10,}"
+        if gz:
+            row += f" -> {gz:>9,}"
+        if br:
+            row += f" -> {br:>9,}"
+        if raw:
+            row += f"  ({(gz or small) / raw:.0%})"
+        lines.append(row + f"  icons -{sprite:,}")
+    return "\n".join(lines)
+
+def build(force=False, jobs=1, precompress=False):
+    """入力が変わったページだけを生成し、生成したページ（と雑誌ごとのアーカイブ）のラベルを返す
     
-    with open("search.html", "w", encoding="utf-8") as f:
-        f.write(generate_search(data))
+    precompress なら各ファイルの横に圧縮版（.gz、brotliがあれば.brも）を置く。
+    fetch_data.py --watch からは、新着があるたびに同じプロセスの中で呼ばれる。
+    """
+    set_precompress(precompress)
+    metrics.start("build")
+    with metrics.stage("load"):
+        data = load_data()
+    previous = {} if force else load_build_manifest()
+    current = {}
+    todo, generated, skipped = [], [], []
     
-    print("Generated: index.html, seido.html, articles.html, journals.html, search.html")
+    with metrics.stage("fingerprint"):
+        # ページを作るコード（このモジュールと template.py）のソース全体も入力に含める。
+        # 生成関数だけでなく、そこから呼ぶ部品（article_meta・icon・header など）や
+        # 書き出しの処理を直しても作り直す（コードを直すと全ページを作り直すことになる）
+        # 圧縮版を置くかどうかも入れる（切り替えたら圧縮版を置き直す・消す）
+        code = [inspect.getsource(m) for m in (inspect.getmodule(build), inspect.getmodule(Template))] + [COMPRESSED]
+        for path, (generate, inputs) in pages(data).items():
+            current[path] = fingerprint(code, inputs)
+            if previous.get(path) == current[path] and os.path.exists(path):
+                skipped.append(path)
+            else:
+                todo.append(path)
+        
+        tasks = [(path, render_page, (path, data)) for path in todo]
+        
+        # 検索インデックスは蓄積した全記事から作る
+        corpus = fingerprint_iter(search_entries(data))
+        current["search/"] = fingerprint(code, inspect.getsource(search_index), corpus, load_thesaurus())
+        if previous.get("search/") == current["search/"] and os.path.exists(
+                os.path.join(search_index.SEARCH_DIR, "manifest.json")):
+            skipped.append("search/")
+        else:
+            tasks.append(("search/", write_search_index, (data,)))
+        
+        # 記事アーカイブは雑誌ごと（新しい記事が入った誌だけ作り直す）
+        for j in data["journals"]:
+            key = f"{ARCHIVE_DIR}/{j.id}/"
+            current[key] = fingerprint(code, fingerprint_iter(journal_articles(data, j.id)), j._replace(articles=()))
+            if previous.get(key) == current[key] and os.path.exists(os.path.join(ARCHIVE_DIR, j.id)):
+                skipped.append(key)
+            else:
+                tasks.append((key, render_archive, (j, data)))
+    
+    with metrics.stage("render"):
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=set_precompress,
+                                     initargs=(precompress,)) as pool:
+                futures = [(label, pool.submit(timed, func, *func_args)) for label, func, func_args in tasks]
+                timings = [(label, future.result()) for label, future in futures]
+        else:
+            timings = [(label, timed(func, *func_args)) for label, func, func_args in tasks]
+    results = []
+    for label, (seconds, result) in timings:
+        metrics.page(label, seconds)
+        results.append((label, result))
+    # 生成しなかったページは前回のアセットを使い続ける
+    assets = {key: used for key, used in previous.get("assets", {}).items()
+              if any(key.startswith(s) for s in skipped)}
+    sizes = {}
+    for label, result in results:
+        if label == "search/":
+            generated.append(f"search/ ({len(result['gramShards'])} gram shards, {len(result['docShards'])} doc shards)")
+        elif label.startswith(ARCHIVE_DIR):
+            generated.append(f"{label} ({result[0]} pages, {result[1]} written)")
+            assets[label] = result[2]
+            if result[1]:
+                sizes[f"{label} ({result[1]} pages)"] = result[3]
+        else:
+            generated.append(label)
+            assets[label] = result[0]
+            if result[1]:
+                sizes[label] = result[1]
+    current["assets"] = assets
+    with metrics.stage("assets"):
+        clean_assets({path for used in assets.values() for path in used})
+    
+    # 全部書き終えてから指紋を残す（途中で失敗したら次回もう一度作る）
+    save_build_manifest(current)
+    metrics.count("generated", len(generated))
+    metrics.count("unchanged", len(skipped))
+    for name, column in (("bytes_raw", 0), ("bytes_minified", 1), ("bytes_gzip", 2)):
+        if column < 2 or COMPRESSED:
+            metrics.count(name, sum(size[column] or 0 for size in sizes.values()))
+    metrics.write_report()
+    print("Generated: " + (", ".join(generated) or "(none)"))
+    if skipped:
+        print("Unchanged: " + ", ".join(skipped))
+    if sizes:
+        print(size_report(sizes))
+    print(metrics.format_summary())
+    return generated
+
+def main():
+    parser = argparse.ArgumentParser(description="data.json / sanpo.db からHTMLを生成する")
+    parser.add_argument("--force", action="store_true", help="入力が変わっていないページも生成し直す")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="生成に使うプロセス数（1なら直列）")
+    parser.add_argument("--precompress", action="store_true",
+                        help="各ファイルの横に圧縮版（.gz / .br）も置く（圧縮済みファイルをそのまま返す配信向け）")
+    args = parser.parse_args()
+    build(args.force, args.jobs, args.precompress)
 
 if __name__ == "__main__":
     main()
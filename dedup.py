@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""記事の重複の見分け
+
+RSSが取れずに検索APIへ切り替えたときや、別々に取った記録をまとめたときに、同じ記事が
+リンクの形（/_article/-char/ja/ と /-char/en/、/_pdf、doi.org など）やタイトルの表記、
+著者の区切り方を変えて入ってくる。同じ記事かどうかは次の順に調べる。
+    1. リンク（またはDOI）から取り出したJ-STAGEの記事ID（雑誌ID/記事コード）が同じ
+    2. 記事IDで決められないときは、タイトルの文字shingleのJaccard類似度が TITLE_THRESHOLD 以上
+       （続きものの番号（第2報、その3、Part II など）が違うものは、似ていても別の記事）
+2 の候補は MinHash の署名を帯（band）に分けた LSH で引く。帯の値をキーにした表
+（store.py の title_bands）を引くだけなので、蓄積した記事の件数によらず候補がすぐ決まる。
+"""
+import re
+import zlib
+from urllib.parse import unquote
+
+from search_index import normalize
+
+# 記事IDや署名・帯の作り方を変えたら上げる（ストアの索引を作り直す）
+VERSION = "2"
+
+# タイトルの文字shingleの長さと、あいまい一致に使う最短の長さ（短いタイトルは取り違えやすい）
+SHINGLE = 3
+MIN_TITLE = 8
+
+# MinHash の値の数と、帯1本あたりの値の数（6本 × 4値）
+NUM_HASHES = 24
+BAND_ROWS = 4
+
+# 候補にするのに一致が要る帯の数。2本にすると、類似度0.85の組は9割、0.9なら98%が候補に残り、
+# よくある語を含むだけの無関係なタイトル（類似度0.2程度）はほとんど候補にならない
+MIN_BANDS = 2
+
+# 同じ記事とみなす類似度
+TITLE_THRESHOLD = 0.8
+
+# 重複と見分けた理由（store.py の article_aliases.reason）の表示名
+REASONS = {"id": "記事ID", "title": "タイトル"}
+
+_JSTAGE_RE = re.compile(r"jstage\.jst\.go\.jp/article/([^/?#]+)/([^/?#]+)/[^/?#]+/([^/?#]+)", re.I)
+# DOIと同じ形の記事コード（"2023-012-B" など、年で始まる）
+_YEAR_CODE_RE = re.compile(r"(?:19|20)\d\d-")
+_DOI_RE = re.compile(r"(?:doi\.org/|doi:\s*)(10\.\d+/[^\s?#]+)", re.I)
+
+_PUNCT_RE = re.compile(r"[\W_]+")
+
+# 続きものの番号（正規化したタイトルから取る）
+_PART_RE = re.compile(r"第\s*([\d〇一二三四五六七八九十]+)\s*[報部回編]|その\s*([\d〇一二三四五六七八九十]+)"
+                      r"|\b(?:part|report)\s*(\d+|[ivx]+)\b")
+_KANJI_DIGITS = {c: i for i, c in enumerate("〇一二三四五六七八九")}
+_ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9, "x": 10}
+
+# 空のビンを埋めるときに、隣のビンとの距離ごとに足す値（ハッシュの値より大きい）
+_ROTATION = 2**32
+_MASK = 2**64 - 1
+
+
+def article_ident(link):
+    """リンクからJ-STAGEの記事ID（"雑誌ID/記事コード"）を取り出す（取れなければ ""）
+
+    /article/<雑誌>/<巻>/<号>/<巻>_<コード>/ の形とDOI（10.xxxx/<雑誌>.<コード>）は同じIDになる
+    （年で始まる記事コードは、リンクでは巻が前に付くがDOIには付かない）。巻を外すのはその形の
+    ときだけで、"67_Info" や "40_1_1" のように巻が無いと他の巻と区別できないコードと早期公開の
+    リンクはそのまま。
+    それ以外のDOIは "doi:<DOI>" を返す。
+    """
+    if not link:
+        return ""
+    m = _JSTAGE_RE.search(link)
+    if m:
+        volume, code = unquote(m.group(2)), unquote(m.group(3))
+        if volume != "advpub" and code.startswith(f"{volume}_") and _YEAR_CODE_RE.match(code, len(volume) + 1):
+            code = code[len(volume) + 1:]
+        return f"{m.group(1).lower()}/{code}"
+    m = _DOI_RE.search(link)
+    if m:
+        doi = unquote(m.group(1)).rstrip("/")
+        journal, dot, code = doi.partition("/")[2].partition(".")
+        if dot and journal.isalnum() and code:
+            return f"{journal.lower()}/{code}"
+        return f"doi:{doi.lower()}"
+    return ""
+
+
+def compatible(ident, other):
+    """記事IDの上で別の記事と決まっていないか（どちらかが無い、または早期公開のID）
+
+    早期公開（advpub）の記事は、巻号が付くと別の記事コードになる。
+    """
+    return not ident or not other or ident == other or "advpub" in ident or "advpub" in other
+
+
+def shingles(title):
+    """タイトルの文字shingleの集合（正規化し、記号と空白は除く）。短すぎれば空"""
+    text = _PUNCT_RE.sub("", normalize(title))
+    if len(text) < MIN_TITLE:
+        return frozenset()
+    return frozenset([text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)])
+
+
+def similarity(a, b):
+    """shingle集合のJaccard類似度"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def parts(title):
+    """タイトルに書かれた続きものの番号（"第2報"・"第二報"・"Part II" は同じ 2 になる）"""
+    return tuple(_part_number(next(g for g in m.groups() if g)) for m in _PART_RE.finditer(normalize(title)))
+
+
+def _part_number(text):
+    if text.isdigit():
+        return int(text)
+    if text in _ROMAN:
+        return _ROMAN[text]
+    if "十" not in text:
+        return int("".join(str(_KANJI_DIGITS[c]) for c in text))
+    tens, _, ones = text.partition("十")
+    return (_KANJI_DIGITS.get(tens, 1) if tens else 1) * 10 + (_KANJI_DIGITS.get(ones, 0) if ones else 0)
+
+
+def signature(grams):
+    """shingle集合の MinHash 署名（NUM_HASHES 個の値）
+
+    値ごとに別のハッシュ関数を当てる代わりに、1回のハッシュで NUM_HASHES 個のビンに
+    振り分けてビンごとの最小値を取る（one permutation hashing）。空のビンは右隣の
+    空でないビンの値で埋める（距離ごとに _ROTATION を足して区別する）。
+    """
+    bins = [None] * NUM_HASHES
+    crc32 = zlib.crc32
+    for gram in grams:
+        v, i = divmod(crc32(gram.encode("utf-8")), NUM_HASHES)
+        b = bins[i]
+        if b is None or v < b:
+            bins[i] = v
+    if None not in bins:
+        return tuple(bins)
+    if not grams:
+        return ()
+    sig = []
+    for i in range(NUM_HASHES):
+        d = 0
+        while bins[(i + d) % NUM_HASHES] is None:
+            d += 1
+        sig.append(bins[(i + d) % NUM_HASHES] + d * _ROTATION)
+    return tuple(sig)
+
+
+def bands(sig):
+    """署名を BAND_ROWS 個ずつの帯に分け、帯ごとのキー（SQLiteの整数に収まる値）にする"""
+    keys = []
+    for start in range(0, len(sig), BAND_ROWS):
+        h = start + 1
+        for v in sig[start:start + BAND_ROWS]:
+            h = ((h ^ v) * 0x100000001B3) & _MASK  # FNV-1a と同じ混ぜ方（値ごと）
+        keys.append(h - 2**64 if h >= 2**63 else h)
+    return keys
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""取得するフィードの登録簿（feeds.json）と、取得する時期の決め方
+
+feeds.json には雑誌（J-STAGE）とニュースのフィードを並べ、フィードごとに取得の間隔を書く。
+    {
+      "journals": [{"id": "sangyoeisei", "name": "産業衛生学雑誌", "publisher": "...",
+                    "url": "...", "desc": "...", "interval_hours": 168}, ...],
+      "news": [{"name": "厚生労働省 新着情報", "url": "https://...", "interval_hours": 24,
+                "watch_interval_hours": 0.25}, ...]
+    }
+fetch_data.py は前回の取得から間隔が過ぎた（due な）フィードだけを取得し、次に取得する
+時期をストア（store.py の feed_schedule）に残す。フィードを増やしても、1回の実行で取得
+するのはその時期が来た分だけになる。fetch_data.py --watch は常駐し、next_due() の時刻まで
+眠ってはその時期が来たフィードを取得する。watch_interval_hours を書いたフィードは、常駐中だけ
+その間隔で取得する（定期実行の取得間隔は interval_hours のまま）。
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from records import Journal
+
+FEEDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feeds.json")
+
+# interval_hours を書かなかったフィードの取得間隔（時間）
+DEFAULT_INTERVAL_HOURS = 24
+
+# 定期実行の起動が少し早くても、この分だけ前なら取得の時期が来たとみなす
+SLACK = timedelta(minutes=30)
+
+# 取得に失敗したフィードは、失敗が続くごとに倍にした間隔（取得間隔が上限）で取り直す
+RETRY_HOURS = 1
+
+
+class NewsFeed(NamedTuple):
+    name: str
+    url: str
+    interval_hours: float = DEFAULT_INTERVAL_HOURS
+
+
+class Registry(NamedTuple):
+    journals: list
+    news: list
+    # フィードのキー（雑誌ID / ニュースのURL。watermarks と同じ）-> 取得間隔（時間）
+    intervals: dict
+    # 同じキー -> --watch での取得間隔（時間）。watch_interval_hours を書いたフィードだけ
+    watch_intervals: dict
+
+
+def load(path=FEEDS_PATH):
+    """feeds.json を読んで Registry を返す（必須の項目が無ければ ValueError）"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    journals = []
+    news = []
+    intervals = {}
+    watch_intervals = {}
+    for entry in data.get("journals", []):
+        _require(entry, ("id", "name"), path)
+        journals.append(Journal(entry["id"], entry["name"], entry.get("publisher", ""),
+                                entry.get("url", ""), entry.get("desc", "")))
+        intervals[entry["id"]] = float(entry.get("interval_hours", DEFAULT_INTERVAL_HOURS))
+        _watch_interval(entry, entry["id"], watch_intervals)
+    for entry in data.get("news", []):
+        _require(entry, ("name", "url"), path)
+        feed = NewsFeed(entry["name"], entry["url"], float(entry.get("interval_hours", DEFAULT_INTERVAL_HOURS)))
+        news.append(feed)
+        intervals[feed.url] = feed.interval_hours
+        _watch_interval(entry, feed.url, watch_intervals)
+    if len(intervals) != len(journals) + len(news):
+        raise ValueError(f"{path}: 雑誌IDまたはフィードのURLが重複しています")
+    return Registry(journals, news, intervals, watch_intervals)
+
+
+def _require(entry, keys, path):
+    missing = [key for key in keys if not entry.get(key)]
+    if missing:
+        raise ValueError(f"{path}: {', '.join(missing)} がありません: {entry}")
+
+
+def _watch_interval(entry, key, watch_intervals):
+    if entry.get("watch_interval_hours") is not None:
+        watch_intervals[key] = float(entry["watch_interval_hours"])
+
+
+def due_time(state, interval_hours=None):
+    """取得の時期（state は store.get_schedule() の1件。一度も取得していなければ None を返す）
+
+    interval_hours（--watch での取得間隔）を渡すと、前回の取得からその間隔が過ぎる時刻の方が
+    早ければそちらにする。記録される next_run は定期実行の間隔のまま。
+    """
+    if not state or not state["next_run"]:
+        return None
+    due = datetime.fromisoformat(state["next_run"])
+    if interval_hours is not None and state["last_run"]:
+        due = min(due, datetime.fromisoformat(state["last_run"]) + timedelta(hours=interval_hours))
+    return due
+
+
+def is_due(state, now, slack=SLACK, interval_hours=None):
+    """取得の時期が来たか（interval_hours は due_time() と同じ）"""
+    due = due_time(state, interval_hours)
+    return due is None or due <= now + slack
+
+
+def next_due(schedule, keys, now, intervals=None):
+    """keys のフィードのうち、いちばん早く取得の時期が来る時刻（一度も取得していないものがあれば now）
+
+    intervals（キー -> --watch での取得間隔）を渡すと、due_time() のようにその間隔も見る。
+    """
+    intervals = intervals or {}
+    times = []
+    for key in keys:
+        due = due_time(schedule.get(key), intervals.get(key))
+        if due is None:
+            return now
+        times.append(due)
+    return min(times, default=now)
+
+
+def next_run(now, interval_hours, failures=0):
+    """次に取得する時期（failures は続けて失敗した回数）"""
+    hours = interval_hours
+    if failures:
+        hours = min(interval_hours, RETRY_HOURS * 2 ** (failures - 1))
+    return now + timedelta(hours=hours)
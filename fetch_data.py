@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
+import argparse
+import codecs
+import hashlib
+import html
+import io
 import json
+import os
 import re
-import urllib.request
-from datetime import datetime
+import signal
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-# RSSフィード
-RSS_FEEDS = [
-    {"name": "厚生労働省 新着情報", "url": "https://www.mhlw.go.jp/stf/news.rdf"},
-]
+import build_html
+import dedup
+import feeds
+import http_client
+import metrics
+import store
+from keywords import KeywordMatcher
+from records import Article, NewsItem, from_row
 
 # 産業保健関連キーワード（これらを含む記事を抽出）
 KEYWORDS = [
@@ -21,235 +37,793 @@ KEYWORDS = [
     "労働基準", "36協定", "働き方改革",
 ]
 
-JOURNALS = [
-    {"id": "sangyoeisei", "name": "産業衛生学雑誌", "publisher": "日本産業衛生学会",
-     "url": "https://www.jstage.jst.go.jp/browse/sangyoeisei/-char/ja",
-     "desc": "産業保健・労働衛生分野の原著論文、総説、症例報告などを掲載。国内最大の産業保健専門誌。"},
-    {"id": "indhealth", "name": "Industrial Health", "publisher": "労働安全衛生総合研究所",
-     "url": "https://www.jstage.jst.go.jp/browse/indhealth/-char/ja",
-     "desc": "世界各国の産業保健研究を掲載する国際英文誌。オープンアクセス。"},
-    {"id": "ohpfrev", "name": "産業医学レビュー", "publisher": "産業医学振興財団",
-     "url": "https://www.jstage.jst.go.jp/browse/ohpfrev/-char/ja",
-     "desc": "産業医・産業保健専門職向けの実務に役立つ総説・解説誌。"},
-    {"id": "jjomh", "name": "産業精神保健", "publisher": "日本産業精神保健学会",
-     "url": "https://www.jstage.jst.go.jp/browse/jjomh/-char/ja",
-     "desc": "職場のメンタルヘルスに特化。ストレスチェック、復職支援などを掲載。"},
-    {"id": "jaohn", "name": "日本産業看護学会誌", "publisher": "日本産業看護学会",
-     "url": "https://www.jstage.jst.go.jp/browse/jaohn/-char/ja",
-     "desc": "産業看護職の実践と研究に関する論文を掲載。"},
-    {"id": "jaohl", "name": "産業保健法学会誌", "publisher": "日本産業保健法学会",
-     "url": "https://www.jstage.jst.go.jp/browse/jaohl/-char/ja",
-     "desc": "産業保健と法律の接点を扱う専門誌。労働安全衛生法、労災認定など。"},
-]
+# 見出し語が KEYWORDS にあるシソーラスの類義語も、その見出し語として照合する
+THESAURUS_PATH = "thesaurus.json"
+
+# 同時取得数の上限（全体 / 同一ホストあたり）
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 2
+
+# 1回の実行でHTTPに使える持ち時間（秒）。再試行で待つのもこの範囲で
+DEADLINE = 600
+
+# 条件付きGET（ETag / Last-Modified）のキャッシュ置き場。Noneで無効
+CACHE_DIR = ".cache/http"
+
+# 1回の取得で1フィードから読む最大件数（前回の最新記事まで来たらそこで止まる）
+MAX_ITEMS_PER_FEED = 50
+
+# 一括取得（--harvest）の1ページの件数（検索APIの上限は1000件）
+HARVEST_PAGE_SIZE = 1000
+
+# 常駐（--watch）で、次の取得の時期まで眠る時間の下限と上限（秒）。上限ごとに登録簿の変更も見る
+WATCH_MIN_SLEEP = 60
+WATCH_MAX_SLEEP = 600
+
+# 取得する雑誌とニュースのフィード（feeds.json。--feeds で別のファイルにできる）
+REGISTRY = feeds.load()
+JOURNALS = REGISTRY.journals
+RSS_FEEDS = REGISTRY.news
+
+
+# 全リクエストで共有するクライアント（ホストごとに接続を持ち回す）
+CLIENT = http_client.Client(per_host=PER_HOST_LIMIT)
+
+
+@contextmanager
+def _open(url, headers=None, timeout=30):
+    """CLIENT でGETし、読み込み中のレスポンス（展開済み）を渡す
+    
+    リクエストの内訳（待ち・接続・TLS・再試行など）と転送量、キャッシュの当たりを metrics に記録する。
+    """
+    conditional = bool(headers and ("If-None-Match" in headers or "If-Modified-Since" in headers))
+    with metrics.request(url) as rec:
+        try:
+            with CLIENT.get(url, headers, timeout, stats=rec) as resp:
+                if conditional:
+                    rec["cache"] = "miss"
+                    metrics.count("http_cache_misses")
+                yield metrics.CountingStream(resp, rec)
+        finally:
+            if rec["status"] == 304:
+                rec["cache"] = "hit"
+                metrics.count("http_cache_hits")
+            if rec["retries"]:
+                metrics.count("http_retries", rec["retries"])
+
+
+def _cache_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
 
+def fetch_cached(url, parse, key="", record=None, timeout=30):
+    """条件付きGETで取得し、レスポンスのストリームをparseした結果を返す
+    
+    前回のETag / Last-Modifiedを送り、304が返ればパースせずに前回の結果を返す。
+    keyはパース条件（件数など）を表し、前回と異なる場合はキャッシュを使わない。
+    parseがレコードのリストを返すなら record にその型を渡す（キャッシュから作り直す）。
+    
+    since（前回の最新項目）はkeyに入れない。入れると新着のあった次の回は必ず全体を取り直すことになる。
+    304のときの前回の結果は、今回のsinceより古い項目を含みうるが、それらは蓄積済みなので
+    upsert で新規にはならず、最新項目も前回と同じになる（件数の計測が少し多めに出るだけ）。
+    """
+    if record is not None:
+        key = f"{record.__name__}:{key}"
+    if not CACHE_DIR:
+        with _open(url, timeout=timeout) as resp:
+            return parse(resp)
+    
+    path = _cache_path(url)
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        entry = {}
+    if entry.get("key") != key:
+        entry = {}
+    
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    
+    try:
+        with _open(url, headers, timeout) as resp:
+            result = parse(resp)
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except http_client.HTTPError as e:
+        if e.code == 304 and "result" in entry:
+            if record is not None:
+                return [from_row(record, row) for row in entry["result"]]
+            return entry["result"]
+        raise
+    
+    if etag or last_modified:
+        entry = {
+            "url": url,
+            "key": key,
+            "etag": etag,
+            "last_modified": last_modified,
+            "result": result,
+        }
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    
+    return result
 
-def fetch_journal_rss(journal_id, count=5):
-    """RSSフィードから最新論文を取得（新着順で確実）"""
+
+def _local_name(tag):
+    """名前空間を除いたタグ名（{http://purl.org/dc/elements/1.1/}date -> date）"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _as_stream(source):
+    """文字列・バイト列ならストリームに包む"""
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def iter_rss_items(source, chunk_size=16384):
+    """RSS（1.0 / 2.0）を読みながら逐次パースし、itemごとに子要素のテキストをdictで返す
+    
+    dc:creatorのように繰り返す要素は "creator" にリストで入る。
+    呼び出し側がイテレーションを打ち切れば、それ以降は読み込まない。
+    """
+    stream = _as_stream(source)
+    parser = ET.XMLPullParser(events=("end",))
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if _local_name(elem.tag) != "item":
+                continue
+            item = {"creator": []}
+            for child in elem:
+                name = _local_name(child.tag)
+                text = "".join(child.itertext()).strip()
+                if name == "creator":
+                    item["creator"].append(text)
+                else:
+                    item.setdefault(name, text)
+            elem.clear()
+            yield item
+    parser.close()
+
+
+def fetch_journal_rss(journal_id, count=5, since=None):
+    """RSSフィードから最新論文を取得（新着順で確実）
+    
+    since（前回の最新記事の {"date", "link"}）を渡すと、それより新しい記事だけを返す。
+    RSSもAPIも取れなければ例外のまま（新着が無いときの [] と区別する）。
+    """
     rss_url = f"https://www.jstage.jst.go.jp/browse/{journal_id}/-char/ja/rss"
     
     try:
-        req = urllib.request.Request(rss_url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            xml = resp.read().decode("utf-8")
-        
-        articles = []
-        items = re.findall(r'<item[^>]*>([\s\S]*?)</item>', xml)
-        
-        for item in items[:count]:
-            # タイトル
-            title_m = re.search(r'<title>([^<]+)</title>', item)
-            title = title_m.group(1).strip() if title_m else ""
-            
-            # URLから巻号情報を抽出
-            link_m = re.search(r'<link>([^<]+)</link>', item)
-            link = link_m.group(1).strip() if link_m else ""
-            
-            # /article/journal/vol/num/... の形式からvol, numを抽出
-            vol_m = re.search(r'/article/[^/]+/(\d+)/([^/]+)/', link)
-            vol = vol_m.group(1) if vol_m else ""
-            num = vol_m.group(2) if vol_m else ""
-            
-            # 公開日
-            date_m = re.search(r'<dc:date>([^<]+)</dc:date>', item)
-            if date_m:
-                try:
-                    dt = datetime.fromisoformat(date_m.group(1).replace("+09:00", "+00:00").replace("Z", "+00:00"))
-                    year = str(dt.year)
-                except:
-                    year = ""
-            else:
-                year = ""
-            
-            # 著者（RSSにはcreatorとして入っている場合がある）
-            authors = []
-            creator_m = re.search(r'<dc:creator>([^<]+)</dc:creator>', item)
-            if creator_m:
-                # カンマや、で分割
-                auth_str = creator_m.group(1)
-                authors = [a.strip() for a in re.split(r'[,、]', auth_str) if a.strip()]
-            
-            if title and not title.startswith("http"):
-                articles.append({
-                    "title": title,
-                    "authors": authors[:5],
-                    "volume": vol,
-                    "number": num,
-                    "year": year,
-                    "link": link,
-                })
-        
+        articles = fetch_cached(rss_url, lambda xml: parse_journal_rss(xml, count, since),
+                                key=f"rss:{count}", record=Article)
+        metrics.count("articles_fetched", len(articles))
         return articles
     
     except Exception as e:
         print(f"  RSS Error for {journal_id}: {e}")
+        metrics.count("rss_fallbacks")
         # RSSが失敗したらAPIにフォールバック
-        return fetch_journal_api(journal_id, count)
+        return fetch_journal_api(journal_id, count, since)
+
+
+def _seen(date, link, since):
+    """前回の最新記事（since）以前の項目か（フィードは新着順なので以降は読まなくてよい）"""
+    if not since:
+        return False
+    if link and link == since.get("link"):
+        return True
+    return bool(date and since.get("date") and date < since["date"])
+
+
+def iter_journal_rss(source, count=5, since=None):
+    """J-STAGEのRSSを読みながら Article を返す（count件返すか、sinceまで来た時点で読み込みを打ち切る）"""
+    n = 0
+    
+    for item in iter_rss_items(source):
+        if n >= count or _seen(item.get("date", ""), item.get("link", ""), since):
+            break
+        
+        title = item.get("title", "")
+        link = item.get("link", "")
+        
+        # /article/journal/vol/num/... の形式からvol, numを抽出
+        vol_m = re.search(r'/article/[^/]+/(\d+)/([^/]+)/', link)
+        vol = vol_m.group(1) if vol_m else ""
+        num = vol_m.group(2) if vol_m else ""
+        
+        # 公開日
+        year = ""
+        if item.get("date"):
+            try:
+                dt = datetime.fromisoformat(item["date"].replace("+09:00", "+00:00").replace("Z", "+00:00"))
+                year = str(dt.year)
+            except:
+                year = ""
+        
+        # 著者（RSSにはcreatorとして入っている場合がある。カンマや、で分割）
+        authors = []
+        for auth_str in item["creator"]:
+            authors += [a.strip() for a in re.split(r'[,、]', auth_str) if a.strip()]
+        
+        if title and not title.startswith("http"):
+            n += 1
+            yield Article(title, tuple(authors[:5]), vol, num, year, link, item.get("date", ""))
 
 
-def fetch_journal_api(journal_id, count=5):
-    """APIから取得（フォールバック）"""
+def parse_journal_rss(source, count=5, since=None):
+    """J-STAGEのRSSをパースして Article のリストを返す"""
+    return list(iter_journal_rss(source, count, since))
+
+
+def fetch_journal_api(journal_id, count=5, since=None):
+    """APIから取得（フォールバック）。sinceがあればその年以降を対象にする（取得に失敗したら例外のまま）"""
     year = datetime.now().year - 1
+    if since and since.get("date", "")[:4].isdigit():
+        year = int(since["date"][:4])
     url = f"https://api.jstage.jst.go.jp/searchapi/do?service=3&cdjournal={journal_id}&count={count}&pubyearfrom={year}"
     
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            xml = resp.read().decode("utf-8")
-        return parse_api_xml(xml)
+        articles = fetch_cached(url, lambda stream: parse_api_xml(stream, count), key=f"api:{count}", record=Article)
+        metrics.count("articles_fetched", len(articles))
+        return articles
     except Exception as e:
         print(f"  API Error for {journal_id}: {e}")
-        return []
+        raise
 
 
-def parse_api_xml(xml):
-    """APIのXMLをパース"""
-    articles = []
-    entries = xml.split("<entry>")
+_CDATA_RE = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.S)
+_NAME_RE = re.compile(r'<name>([^<]*)</name>')
+
+
+def _xml_value(raw):
+    """要素の中身をテキストにする（CDATAはそのまま、それ以外は実体参照を戻す）"""
+    if not raw:
+        return ""
+    m = _CDATA_RE.search(raw)
+    if m:
+        return m.group(1).strip()
+    return html.unescape(raw).strip()
+
+
+def _between(text, open_tag, close_tag, start=0, end=None):
+    """text[start:end] の中で最初の open_tag〜close_tag の中身を返す（無ければNone）"""
+    if end is None:
+        end = len(text)
+    i = text.find(open_tag, start, end)
+    if i < 0:
+        return None
+    i += len(open_tag)
+    j = text.find(close_tag, i, end)
+    return text[i:j] if j >= 0 else None
+
+
+def _lang(block, lang):
+    """<ja>…</ja> / <en>…</en> の中身"""
+    if block is None:
+        return None
+    return _between(block, f"<{lang}>", f"</{lang}>")
+
+
+def _api_entry(buf, start, end):
+    """buf[start:end]（1件分の<entry>）から Article を作る（タイトルが無ければNone）"""
+    # タイトル（日本語 → 英語 → <title>の順）
+    article_title = _between(buf, "<article_title>", "</article_title>", start, end)
+    title = _xml_value(_lang(article_title, "ja")) or _xml_value(_lang(article_title, "en"))
+    if not title:
+        title = _xml_value(_between(buf, "<title>", "</title>", start, end))
+        if title.startswith("http"):
+            title = ""
+    if not title:
+        return None
     
-    for entry in entries[1:]:
-        entry = entry.split("</entry>")[0]
+    # 著者（日本語名があれば日本語、なければ英語）
+    authors = []
+    author = _between(buf, "<author>", "</author>", start, end)
+    for lang in ("ja", "en"):
+        block = _lang(author, lang)
+        if block is not None:
+            if "<![CDATA[" in block:
+                names = _CDATA_RE.findall(block)
+            else:
+                names = [html.unescape(n) for n in _NAME_RE.findall(block)]
+            authors = [n.strip() for n in names if n.strip()]
+            if authors:
+                break
+    
+    # 巻号年（prism:volume などの接頭辞は問わない）
+    vol = (_between(buf, "volume>", "<", start, end) or "").strip()
+    num = _between(buf, "number>", "<", start, end) or ""
+    year = (_between(buf, "pubyear>", "<", start, end) or "").strip()
+    link = ""
+    link_at = buf.find("<link ", start, end)
+    if link_at >= 0:
+        link = _between(buf, 'href="', '"', link_at, end) or ""
+    
+    return Article(
+        title,
+        tuple(authors[:5]),
+        vol if vol.isdigit() else "",
+        html.unescape(num).strip(),
+        year if year.isdigit() else "",
+        html.unescape(link),
+    )
+
+
+def iter_api_entries(source, chunk_size=262144, meta=None):
+    """J-STAGE検索APIのレスポンスを先頭から1回だけ走査し、<entry>ごとに Article を返す
+    
+    各項目は1件分の範囲に限ったstr.findで拾うので、entryをまたいだ後戻りが起きない。
+    ストリームは</entry>の切れ目までずつ処理するので、全体を文字列にしない。
+    metaにdictを渡すと、総件数（opensearch:totalResults）を "total" に入れる。
+    """
+    stream = _as_stream(source)
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    buf = ""
+    eof = False
+    
+    while not eof:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buf += decoder.decode(chunk)
+        else:
+            buf += decoder.decode(b"", final=True)
+            eof = True
         
-        # タイトル
-        title = ""
-        m = re.search(r'article_title[\s\S]*?<ja>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
-        if m:
-            title = m.group(1).strip()
-        if not title:
-            m = re.search(r'article_title[\s\S]*?<en>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
-            if m:
-                title = m.group(1).strip()
-        if not title:
-            m = re.search(r'<title>[\s\S]*?CDATA\[([\s\S]*?)\]\]', entry)
-            if m and not m.group(1).startswith("http"):
-                title = m.group(1).strip()
+        if meta is not None and "total" not in meta:
+            total = _between(buf, "totalResults>", "<")
+            if total and total.strip().isdigit():
+                meta["total"] = int(total)
         
-        if not title:
+        pos = 0
+        while True:
+            start = buf.find("<entry>", pos)
+            if start < 0:
+                pos = len(buf) if eof else max(pos, len(buf) - len("<entry>"))
+                break
+            end = buf.find("</entry>", start)
+            if end < 0:
+                pos = start
+                break
+            pos = end + len("</entry>")
+            article = _api_entry(buf, start, end)
+            if article:
+                yield article
+        buf = buf[pos:]
+
+
+def parse_api_xml(xml, limit=None):
+    """APIのXMLをパース（limit件で打ち切り）"""
+    articles = []
+    for article in iter_api_entries(xml):
+        if limit is not None and len(articles) >= limit:
+            break
+        articles.append(article)
+    return articles
+
+
+def iter_news_rss(source, count=50, since=None):
+    """厚労省RSSの項目を新着順に NewsItem で返す（キーワードでの絞り込みは呼び出し側）"""
+    n = 0
+    
+    for item in iter_rss_items(source):
+        if n >= count:
+            break
+        if not item.get("title"):
             continue
         
-        # 著者
-        authors = []
-        author_match = re.search(r'<author>([\s\S]*?)</author>', entry)
-        if author_match:
-            author_block = author_match.group(1)
-            ja_block = re.search(r'<ja>([\s\S]*?)</ja>', author_block)
-            if ja_block:
-                names = re.findall(r'CDATA\[([\s\S]*?)\]\]', ja_block.group(1))
-                authors = [n.strip() for n in names if n.strip()]
-            else:
-                en_block = re.search(r'<en>([\s\S]*?)</en>', author_block)
-                if en_block:
-                    names = re.findall(r'CDATA\[([\s\S]*?)\]\]', en_block.group(1))
-                    authors = [n.strip() for n in names if n.strip()]
+        date_str = ""
+        if item.get("date"):
+            try:
+                dt = datetime.fromisoformat(item["date"].replace("+09:00", ""))
+                date_str = dt.strftime("%Y-%m-%d")
+            except:
+                date_str = item["date"][:10]
         
-        # 巻号年
-        vol = re.search(r'volume>(\d+)<', entry)
-        num = re.search(r'number>([^<]+)<', entry)
-        year = re.search(r'pubyear>(\d+)<', entry)
-        link = re.search(r'link[^>]*href="([^"]+)"', entry)
+        link = item.get("link", "")
+        if _seen(date_str, link, since):
+            break
         
-        articles.append({
-            "title": title,
-            "authors": authors[:5],
-            "volume": vol.group(1) if vol else "",
-            "number": num.group(1) if num else "",
-            "year": year.group(1) if year else "",
-            "link": link.group(1) if link else "",
-        })
+        n += 1
+        yield NewsItem(item["title"], link, date_str)
+
+
+def parse_news_rss(source, count=50, since=None):
+    """厚労省RSSをパースして NewsItem のリストを返す"""
+    return list(iter_news_rss(source, count, since))
+
+
+def topic_terms():
+    """照合する語 -> 付けるキーワード（KEYWORDS の語）の表"""
+    terms = {kw: [kw] for kw in KEYWORDS}
+    try:
+        with open(THESAURUS_PATH, encoding="utf-8") as f:
+            thesaurus = json.load(f)
+    except (OSError, ValueError):
+        thesaurus = {}
+    for key, synonyms in thesaurus.items():
+        if key in KEYWORDS:
+            for term in synonyms:
+                terms.setdefault(term, [])
+                if key not in terms[term]:
+                    terms[term].append(key)
+    return terms
+
+
+@lru_cache(maxsize=None)
+def news_matcher():
+    """topic_terms() のオートマトン（最初に1回だけ作る。KEYWORDS を変えたら cache_clear()）"""
+    return KeywordMatcher(topic_terms())
+
+
+def filter_news(entries, source):
+    """キーワードを含むタイトルのニュースだけを、配信元と一致したキーワードを付けて返す"""
+    find = news_matcher().find
+    news = []
+    for entry in entries:
+        found = find(entry.title)
+        if found:
+            # _replace() は項目ごとに dict を経由して遅いので、コンストラクタで作る
+            news.append(NewsItem(entry.title, entry.link, entry.date, source, tuple(found)))
+    return news
+
+
+def fetch_news_feed(feed, since=None):
+    """ニュースのフィード1つから産業保健関連ニュースを取得（取得に失敗したら例外のまま）
     
-    return articles[:5]
+    sinceがあればそれより新しい項目だけを読む。戻り値は (ニュース, 今回の最新項目またはNone)。
+    """
+    entries = fetch_cached(feed.url, lambda xml: parse_news_rss(xml, MAX_ITEMS_PER_FEED, since),
+                           key="news", record=NewsItem)
+    with metrics.stage("filter"):
+        matched = filter_news(entries, feed.name)
+    metrics.count("news_fetched", len(entries))
+    metrics.count("news_matched", len(matched))
+    latest = {"date": entries[0].date, "link": entries[0].link} if entries else None
+    return matched, latest
 
 
-def fetch_rss():
-    """厚労省RSSから産業保健関連ニュースを取得"""
+def fetch_rss(watermarks=None, news_feeds=None):
+    """ニュースのフィード（既定はRSS_FEEDSのすべて）から順に産業保健関連ニュースを取得
+    
+    watermarks（フィードURL -> 前回の最新項目）があれば、それより新しい項目だけを読む。
+    戻り値は (ニュース, フィードURL -> 今回の最新項目)。
+    """
+    watermarks = watermarks or {}
     news = []
+    latest = {}
     
-    for feed in RSS_FEEDS:
+    for feed in RSS_FEEDS if news_feeds is None else news_feeds:
         try:
-            req = urllib.request.Request(feed["url"], headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                xml = resp.read().decode("utf-8")
-            
-            items = re.findall(r'<item>([\s\S]*?)</item>', xml)
-            
-            for item in items[:50]:
-                title_m = re.search(r'<title>([^<]+)</title>', item)
-                link_m = re.search(r'<link>([^<]+)</link>', item)
-                date_m = re.search(r'<dc:date>([^<]+)</dc:date>', item)
-                
-                if not title_m:
-                    continue
-                
-                title = title_m.group(1).strip()
-                
-                if not any(kw in title for kw in KEYWORDS):
-                    continue
-                
-                link = link_m.group(1).strip() if link_m else ""
-                date_str = ""
-                if date_m:
-                    try:
-                        dt = datetime.fromisoformat(date_m.group(1).replace("+09:00", ""))
-                        date_str = dt.strftime("%Y-%m-%d")
-                    except:
-                        date_str = date_m.group(1)[:10]
-                
-                news.append({
-                    "title": title,
-                    "link": link,
-                    "date": date_str,
-                    "source": feed["name"]
-                })
-        
+            matched, mark = fetch_news_feed(feed, watermarks.get(feed.url))
         except Exception as e:
-            print(f"  Error fetching RSS {feed['name']}: {e}")
+            print(f"  Error fetching RSS {feed.name}: {e}")
+            metrics.count("feed_errors")
+            continue
+        if mark:
+            latest[feed.url] = mark
+        news.extend(matched)
     
-    news.sort(key=lambda x: x.get("date", ""), reverse=True)
-    return news[:10]
+    news.sort(key=lambda x: x.date, reverse=True)
+    return news, latest
+
+
+def count_duplicates(duplicates):
+    """store.upsert_articles() がまとめた重複の件数を計測に足し、合計を返す"""
+    for reason, n in duplicates.items():
+        metrics.count(f"articles_duplicate_{reason}", n)
+    return sum(duplicates.values())
+
+
+def harvest_journal(journal_id, page_size=HARVEST_PAGE_SIZE):
+    """検索APIをstart/countでページ送りして全巻号の記事をストアに蓄積する
+    
+    ページごとに次の開始位置をストア（harvest_state）に記録するので、
+    中断しても次回の --harvest で続きから再開する。取得し終えた誌は飛ばす。
+    """
+    conn = store.connect()
+    state = store.get_harvest_state(conn, journal_id)
+    if state["done"]:
+        print(f"  {journal_id}: 取得済み（{state['total']}件）")
+        return 0
+    
+    added = 0
+    start = state["next_start"]
+    while True:
+        url = f"https://api.jstage.jst.go.jp/searchapi/do?service=3&cdjournal={journal_id}&start={start}&count={page_size}"
+        meta = {}
+        try:
+            with _open(url, timeout=120) as resp:
+                page = list(iter_api_entries(resp, meta=meta))
+        except Exception as e:
+            print(f"  Harvest Error for {journal_id} (start={start}): {e}")
+            break
+        
+        metrics.count("articles_fetched", len(page))
+        duplicates = {}
+        added += store.upsert_articles(conn, journal_id, page, duplicates)
+        count_duplicates(duplicates)
+        
+        start += page_size
+        total = meta.get("total")
+        done = not page or (total is not None and start > total)
+        store.set_harvest_state(conn, journal_id, start, total, done)
+        print(f"  {journal_id}: {min(start - 1, total or start - 1)}/{total if total is not None else '?'}")
+        if done:
+            break
+    
+    conn.close()
+    return added
+
+
+def due_feeds(schedule, now, force=False, slack=feeds.SLACK, intervals=None):
+    """取得の時期が来た (雑誌, ニュースのフィード)。force ならすべて
+
+    intervals は --watch での取得間隔（feeds.Registry.watch_intervals）。
+    """
+    intervals = intervals or {}
+    due_journals = [j for j in JOURNALS
+                    if force or feeds.is_due(schedule.get(j.id), now, slack, intervals.get(j.id))]
+    due_news = [f for f in RSS_FEEDS
+                if force or feeds.is_due(schedule.get(f.url), now, slack, intervals.get(f.url))]
+    metrics.count("feeds_due", len(due_journals) + len(due_news))
+    metrics.count("feeds_skipped", len(JOURNALS) + len(RSS_FEEDS) - len(due_journals) - len(due_news))
+    print(f"取得するフィード: 雑誌 {len(due_journals)}/{len(JOURNALS)}誌、ニュース {len(due_news)}/{len(RSS_FEEDS)}件")
+    return due_journals, due_news
+
+
+def fetch_feeds(conn, due_journals, due_news, schedule, now, workers=MAX_WORKERS):
+    """フィードを並行取得してストアに反映し、次に取得する時期を記録する
+    
+    前回の最新記事（ハイウォーターマーク）より新しいものだけを読む。
+    戻り値は新しく入った記事とニュースの件数。
+    """
+    journal_marks = {j.id: store.get_watermark(conn, j.id) for j in due_journals}
+    news_marks = {f.url: store.get_watermark(conn, f.url) for f in due_news}
+    total = 0
+    
+    def reschedule(feed, failures=0):
+        """取得を終えたフィードの次の時期を記録する（failures は続けて失敗した回数）"""
+        interval = REGISTRY.intervals.get(feed, feeds.DEFAULT_INTERVAL_HOURS)
+        store.set_schedule(conn, feed, now.isoformat(timespec="seconds"),
+                           feeds.next_run(now, interval, failures).isoformat(timespec="seconds"), failures)
+    
+    # 各誌とニュースのフィードを並行取得し、結果は登録簿の順でストアに反映する
+    with metrics.stage("fetch"), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        news_futures = [pool.submit(fetch_news_feed, f, news_marks[f.url]) for f in due_news]
+        futures = [pool.submit(fetch_journal_rss, j.id, MAX_ITEMS_PER_FEED, journal_marks[j.id])
+                   for j in due_journals]
+        
+        if due_journals:
+            print("J-STAGE RSSから論文データを取得中...")
+        for j, future in zip(due_journals, futures):
+            try:
+                articles = future.result()
+            except Exception as e:
+                print(f"  Error fetching {j.name}: {e}")
+                metrics.count("feed_errors")
+                reschedule(j.id, schedule.get(j.id, {}).get("failures", 0) + 1)
+                continue
+            duplicates = {}
+            with metrics.stage("store"):
+                added = store.upsert_articles(conn, j.id, articles, duplicates)
+                # APIフォールバックの結果には公開日が無いので、マークはRSSで取れたときだけ進める
+                if articles and articles[0].date:
+                    store.set_watermark(conn, j.id, articles[0].date, articles[0].link)
+            reschedule(j.id)
+            metrics.count("articles_added", added)
+            total += added
+            duplicated = count_duplicates(duplicates)
+            print(f"  {j.name} -> {len(articles)}件（新規 {added}件、重複 {duplicated}件）")
+        
+        if due_news:
+            print("ニュースのフィードから新着情報を取得中...")
+        news = []
+        latest = {}
+        for f, future in zip(due_news, news_futures):
+            try:
+                matched, latest[f.url] = future.result()
+            except Exception as e:
+                print(f"  Error fetching RSS {f.name}: {e}")
+                metrics.count("feed_errors")
+                reschedule(f.url, schedule.get(f.url, {}).get("failures", 0) + 1)
+                continue
+            news.extend(matched)
+            print(f"  {f.name} -> {len(matched)}件")
+        news.sort(key=lambda x: x.date, reverse=True)
+        with metrics.stage("store"):
+            added = store.upsert_news(conn, news)
+            for url, mark in latest.items():
+                if mark:
+                    store.set_watermark(conn, url, mark["date"], mark["link"])
+                reschedule(url)
+        metrics.count("news_added", added)
+        total += added
+    return total
+
+
+def print_duplicates(conn):
+    duplicates = store.count_duplicates(conn)
+    if duplicates:
+        print("重複としてまとめたリンク（累計）: " +
+              "、".join(f"{dedup.REASONS.get(reason, reason)}で一致 {n}件" for reason, n in duplicates.items()))
+
+
+def publish(conn):
+    """最終更新日時を記録して data.json を書き出す"""
+    store.set_meta(conn, "updated", datetime.now().strftime("%Y-%m-%d %H:%M"))
+    with metrics.stage("export"):
+        store.export_json(conn, "data.json")
+
+
+def load_registry(path):
+    """フィードの登録簿を読み直す"""
+    global REGISTRY, JOURNALS, RSS_FEEDS
+    REGISTRY = feeds.load(path)
+    JOURNALS, RSS_FEEDS = REGISTRY.journals, REGISTRY.news
+
+
+def watch(conn, feeds_path, workers=MAX_WORKERS, deadline=DEADLINE, jobs=1, force=False):
+    """常駐して、フィードごとの取得の時期が来るたびに取得する（Ctrl+C / SIGTERM で終わる）
+    
+    時期が来るまでは眠っているだけで、起きたときも取得するのはその時期が来たフィードだけ
+    （条件付きGETなので、変わっていなければ 304 で終わる）。新しい記事やニュースが入ったときだけ
+    data.json を書き出し、build_html.build() で入力の変わったページだけを作り直す。
+    登録簿（feeds_path）を書き換えたら、次に起きたときに読み直す。
+    watch_interval_hours を書いたフィードは、その間隔で取得する（feeds.due_time()）。
+    """
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    loaded = os.path.getmtime(feeds_path)
+    rebuild = False
+    print(f"フィードの監視を開始（{len(JOURNALS)}誌、ニュース {len(RSS_FEEDS)}件。Ctrl+C で終了）")
+    try:
+        while True:
+            if os.path.getmtime(feeds_path) != loaded:
+                loaded = os.path.getmtime(feeds_path)
+                try:
+                    load_registry(feeds_path)
+                except (OSError, ValueError) as e:
+                    print(f"登録簿を読み直せませんでした（前の登録簿のまま）: {e}")
+                else:
+                    store.upsert_journals(conn, JOURNALS)
+                    print(f"登録簿を読み直しました（{len(JOURNALS)}誌、ニュース {len(RSS_FEEDS)}件）")
+            
+            now = datetime.now()
+            schedule = store.get_schedule(conn)
+            if force or feeds.next_due(schedule, REGISTRY.intervals, now, REGISTRY.watch_intervals) <= now:
+                print(f"\n[{now:%Y-%m-%d %H:%M:%S}]")
+                metrics.start("fetch")
+                CLIENT.set_deadline(deadline)
+                due_journals, due_news = due_feeds(schedule, now, force, timedelta(0), REGISTRY.watch_intervals)
+                force = False
+                try:
+                    added = fetch_feeds(conn, due_journals, due_news, schedule, now, workers)
+                except Exception as e:
+                    print(f"  Error fetching feeds: {e}")
+                    metrics.count("feed_errors")
+                    added = 0
+                if added:
+                    # 新着のあったときだけ書き出して生成し直す（記録もこのときだけ残す）
+                    publish(conn)
+                    metrics.write_report()
+                    print(metrics.format_summary())
+                    rebuild = True
+                else:
+                    print("新着なし")
+            
+            # 生成に失敗したら、次に起きたときにもう一度作る
+            if rebuild:
+                try:
+                    build_html.build(jobs=jobs)
+                    rebuild = False
+                except Exception as e:
+                    print(f"  Error building pages: {e}")
+            
+            wake = feeds.next_due(store.get_schedule(conn), REGISTRY.intervals, datetime.now(), REGISTRY.watch_intervals)
+            wait = min(max((wake - datetime.now()).total_seconds(), WATCH_MIN_SLEEP), WATCH_MAX_SLEEP)
+            time.sleep(wait)
+    except KeyboardInterrupt:
+        print("\nフィードの監視を終了")
+    finally:
+        conn.close()
+        CLIENT.close()
 
 
 def main():
-    print("J-STAGE RSSから論文データを取得中...")
+    global CACHE_DIR
+    parser = argparse.ArgumentParser(description="J-STAGE・厚労省RSSからdata.jsonを生成")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同時取得数の上限")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, help="同一ホストへの同時接続数の上限")
+    parser.add_argument("--no-cache", action="store_true", help="条件付きGETのキャッシュを使わない")
+    parser.add_argument("--deadline", type=float, default=DEADLINE, help="HTTPに使える持ち時間（秒、0で無制限）")
+    parser.add_argument("--harvest", action="store_true",
+                        help=f"各誌の全記事を検索APIから {store.DB_PATH} に一括取得する（中断しても再開可）")
+    parser.add_argument("--feeds", help=f"フィードの登録簿（既定は {os.path.basename(feeds.FEEDS_PATH)}）")
+    parser.add_argument("--all", action="store_true", help="取得の時期に関係なくすべてのフィードを取得する")
+    parser.add_argument("--watch", action="store_true",
+                        help="常駐してフィードごとの取得の時期に取得し、新着があればページを生成し直す")
+    parser.add_argument("--jobs", type=int, default=1, help="--watch でページの生成に使うプロセス数")
+    args = parser.parse_args()
+    if args.feeds:
+        load_registry(args.feeds)
+    CLIENT.per_host = max(1, args.per_host)
+    CLIENT.set_deadline(args.deadline)
+    if args.no_cache:
+        CACHE_DIR = None
+    
+    metrics.start("fetch")
+    conn = store.connect()
+    if not store.journals(conn) and os.path.exists("data.json"):
+        # ストアを初めて作るときは既存のdata.jsonを取り込んでおく
+        store.import_json(conn, "data.json")
+    store.upsert_journals(conn, JOURNALS)
+    
+    # キーワード（シソーラスを含む）が変わったら、蓄積済みのニュースにも付け直す
+    topics = hashlib.sha1(json.dumps(topic_terms(), ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    if store.get_meta(conn, "news_topics") != topics:
+        store.retag_news(conn, news_matcher().find)
+        store.set_meta(conn, "news_topics", topics)
+    
+    # 重複の見分け方（dedup.py）が変わったら索引を作り直し、蓄積済みの重複もまとめる
+    if store.get_meta(conn, "dedup") != dedup.VERSION:
+        with metrics.stage("dedup"):
+            duplicates = {}
+            merged = store.reindex_articles(conn, stats=duplicates)
+        count_duplicates(duplicates)
+        store.set_meta(conn, "dedup", dedup.VERSION)
+        print(f"重複の索引を作成（蓄積済みの重複 {merged}件をまとめた）")
     
-    data = {
-        "updated": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "journals": [],
-        "news": []
-    }
+    if args.harvest:
+        print("J-STAGE検索APIから全記事を一括取得中...")
+        with metrics.stage("harvest"), ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            counts = list(pool.map(harvest_journal, [j.id for j in JOURNALS]))
+        for j, added in zip(JOURNALS, counts):
+            print(f"  {j.name} -> {added}件追加")
+        conn.close()
+        CLIENT.close()
+        metrics.write_report()
+        print(metrics.format_summary())
+        return
     
-    for j in JOURNALS:
-        print(f"  {j['name']}...")
-        articles = fetch_journal_rss(j["id"])  # RSSを使う
-        print(f"    -> {len(articles)}件")
-        data["journals"].append({**j, "articles": articles})
+    if args.watch:
+        watch(conn, args.feeds or feeds.FEEDS_PATH, args.workers, args.deadline, args.jobs, args.all)
+        return
     
-    print("厚労省RSSから新着情報を取得中...")
-    data["news"] = fetch_rss()
-    print(f"    -> {len(data['news'])}件")
+    # 前回の取得から間隔が過ぎたフィードだけを取得する
+    now = datetime.now()
+    schedule = store.get_schedule(conn)
+    due_journals, due_news = due_feeds(schedule, now, args.all)
+    if not due_journals and not due_news:
+        upcoming = min((state["next_run"] for state in schedule.values() if state["next_run"]), default="")
+        print(f"取得の時期になったフィードはありません（次は {upcoming}）")
+        conn.close()
+        CLIENT.close()
+        metrics.write_report()
+        return
     
-    with open("data.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    fetch_feeds(conn, due_journals, due_news, schedule, now, args.workers)
+    print_duplicates(conn)
+    publish(conn)
+    conn.close()
+    CLIENT.close()
     
-    print(f"\n保存: data.json")
+    report = metrics.write_report()
+    print(f"\n保存: {store.DB_PATH}, data.json, {report}")
+    print(metrics.format_summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""fetch_data.py 用のHTTPクライアント
+
+urllib.request.urlopen は毎回つなぎ直し、一度の失敗でそのまま例外になる。Client は
+- ホストごとに接続を持ち回す（keep-alive）。同じホストへの同時接続数も制限する
+- 接続エラー・タイムアウト・429 / 5xx はジッター付きの指数バックオフで再試行する
+- 実行全体の持ち時間（deadline）を超える待ち方はしない
+- gzip / deflate で返ってきた本文は読みながら展開する
+- リダイレクトをたどる
+get() に stats（dict）を渡すと、枠の空き待ち・名前解決・TCP接続・TLS・ヘッダー受信までの
+時間、バックオフで待った時間、再試行とリダイレクトの回数、転送量（圧縮されたまま）を足し込む。
+"""
+import http.client
+import random
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import zlib
+from contextlib import contextmanager
+
+USER_AGENT = "Mozilla/5.0"
+
+# 再試行するステータス（それ以外の4xx / 5xx はすぐに HTTPError）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+# 展開しながら読むときに一度に読む圧縮データの量
+CHUNK_SIZE = 16384
+
+# stats に足し込む項目
+STATS = {"wait": 0.0, "dns": 0.0, "connect": 0.0, "tls": 0.0, "open": 0.0, "backoff": 0.0,
+         "retries": 0, "redirects": 0, "wire_bytes": 0, "status": None}
+
+# 相手に切られていた使い回しの接続で起きる例外（数えずにつなぎ直す）
+_STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class HTTPError(Exception):
+    """2xx で終わらなかったレスポンス（条件付きGETの 304 もこれになる）"""
+
+    def __init__(self, url, code, headers):
+        super().__init__(f"HTTP Error {code}: {url}")
+        self.url = url
+        self.code = code
+        self.headers = headers
+
+
+class DeadlineExceeded(TimeoutError):
+    """実行全体の持ち時間を使い切った"""
+
+
+class _Connection(http.client.HTTPConnection):
+    """名前解決とTCP接続の時間を timings に足す HTTPConnection"""
+
+    timings = None
+
+    def connect(self):
+        t = time.perf_counter()
+        infos = socket.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        self._record("dns", t)
+        t = time.perf_counter()
+        error = None
+        for family, kind, proto, _, address in infos:
+            sock = socket.socket(family, kind, proto)
+            try:
+                sock.settimeout(self.timeout)
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error or OSError(f"cannot connect to {self.host}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self._record("connect", t)
+
+    def _record(self, key, t):
+        if self.timings is not None:
+            self.timings[key] += time.perf_counter() - t
+
+
+class _TLSConnection(_Connection):
+    default_port = http.client.HTTPS_PORT
+
+    def __init__(self, host, port=None, timeout=None, context=None):
+        super().__init__(host, port, timeout)
+        self.context = context
+
+    def connect(self):
+        super().connect()
+        t = time.perf_counter()
+        self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host)
+        self._record("tls", t)
+
+
+class Response:
+    """本文を展開しながら読むレスポンス（read() は展開後のバイト列を返す）"""
+
+    def __init__(self, resp, url, stats):
+        self.raw = resp
+        self.url = url
+        self.status = resp.status
+        self.headers = resp.headers
+        self._stats = stats
+        self._eof = False
+        self._started = False
+        encoding = (resp.headers.get("Content-Encoding") or "").strip().lower()
+        self._encoding = encoding if encoding in ("gzip", "x-gzip", "deflate") else None
+        self._decoder = self._new_decoder(raw_deflate=False)
+
+    def _new_decoder(self, raw_deflate):
+        if self._encoding is None:
+            return None
+        if self._encoding != "deflate":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # deflate は本来 zlib 形式だが、ヘッダー無しで送ってくるサーバーもある
+        return zlib.decompressobj(-zlib.MAX_WBITS if raw_deflate else zlib.MAX_WBITS)
+
+    def _read_raw(self, size):
+        data = self.raw.read(size) if size >= 0 else self.raw.read()
+        self._stats["wire_bytes"] += len(data)
+        return data
+
+    def _decompress(self, chunk, limit):
+        try:
+            data = self._decoder.decompress(chunk, limit)
+        except zlib.error:
+            if self._encoding != "deflate" or self._started:
+                raise
+            self._decoder = self._new_decoder(raw_deflate=True)
+            data = self._decoder.decompress(chunk, limit)
+        self._started = True
+        return data
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        if self._decoder is None:
+            return self._read_raw(size)
+        # 展開後が size を超えないように展開する（残りは unconsumed_tail に持ち越す）
+        parts = []
+        have = 0
+        while not self._eof and (size < 0 or have < size):
+            limit = size - have if size >= 0 else 0
+            if self._decoder.unconsumed_tail:
+                data = self._decoder.decompress(self._decoder.unconsumed_tail, limit)
+            else:
+                chunk = self._read_raw(CHUNK_SIZE if size >= 0 else -1)
+                if chunk:
+                    data = self._decompress(chunk, limit)
+                else:
+                    data = self._decoder.flush()
+                    self._eof = True
+            parts.append(data)
+            have += len(data)
+        return b"".join(parts)
+
+
+class Client:
+    """ホストごとに接続を持ち回すHTTPクライアント（スレッド間で共有してよい）
+
+    per_host: 同じホストへの同時接続数
+    retries: 再試行の回数（最初の1回は含まない）
+    backoff: 1回目の再試行までの待ち時間の上限（秒）。回を重ねるごとに倍になり max_backoff で頭打ち。
+             実際の待ち時間は 0 からその上限までの一様乱数（full jitter）
+    deadline: 持ち時間（秒）。None なら無制限。set_deadline() で設定し直せる
+    rewrite: URLを書き換える関数（ベンチマークでローカルのサーバーに向けるのに使う）
+    """
+
+    def __init__(self, per_host=2, retries=3, backoff=0.5, max_backoff=30.0, deadline=None):
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rewrite = None
+        self.set_deadline(deadline)
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._idle = {}
+        self._context = ssl.create_default_context()
+
+    def set_deadline(self, seconds):
+        """今から seconds 秒を持ち時間にする（None / 0 で無制限）"""
+        self.deadline = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """持ち時間の残り（秒）。無制限なら None"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def close(self):
+        """持ち回している接続を閉じる"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[key]
+
+    def _connection(self, key):
+        """(接続, 使い回しか)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            return _TLSConnection(host, port, context=self._context), False
+        return _Connection(host, port), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def _timeout(self, timeout):
+        """1回の読み書きに使える時間（持ち時間の残りで頭打ち）"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline exceeded")
+        return min(timeout, remaining)
+
+    def _delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after and retry_after.strip().isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def _send(self, key, url, target, headers, timeout, stats):
+        """リクエストを送ってヘッダーまで受け取る（失敗したらバックオフして再試行）"""
+        attempt = 0
+        while True:
+            limit = self._timeout(timeout)
+            conn, reused = self._connection(key)
+            conn.timeout = limit
+            if conn.sock:
+                conn.sock.settimeout(limit)
+            conn.timings = stats
+            retry_after = None
+            t = time.perf_counter()
+            connecting = stats["dns"] + stats["connect"] + stats["tls"]
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused and isinstance(e, _STALE):
+                    continue
+                resp, error = None, e
+            finally:
+                # 接続し直した分（名前解決・TCP・TLS）はそれぞれの項目に入っているので除く
+                stats["open"] += time.perf_counter() - t - (stats["dns"] + stats["connect"] + stats["tls"] - connecting)
+            if resp is not None:
+                stats["status"] = resp.status
+                if resp.status not in RETRY_STATUS:
+                    return resp, conn
+                retry_after = resp.headers.get("Retry-After")
+                error = HTTPError(url, resp.status, resp.headers)
+                conn.close()
+
+            if attempt >= self.retries:
+                raise error
+            delay = self._delay(attempt, retry_after)
+            remaining = self.remaining()
+            if remaining is not None and delay >= remaining:
+                raise error
+            time.sleep(delay)
+            stats["backoff"] += delay
+            attempt += 1
+            stats["retries"] += 1
+
+    @contextmanager
+    def _exchange(self, url, headers, timeout, stats):
+        """ホストの枠と接続を押さえてヘッダーまで受け取り、レスポンスを渡す
+
+        本文を読み切っていれば接続を持ち回しに戻し、途中でやめたら閉じる。
+        """
+        parts = urllib.parse.urlsplit(self.rewrite(url) if self.rewrite else url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        t = time.perf_counter()
+        with self._slot(key):
+            stats["wait"] += time.perf_counter() - t
+            resp, conn = self._send(key, url, target, headers, timeout, stats)
+            try:
+                yield resp
+            finally:
+                if resp.isclosed() and not resp.will_close:
+                    self._release(key, conn)
+                else:
+                    conn.close()
+
+    @contextmanager
+    def get(self, url, headers=None, timeout=30, stats=None):
+        """GETして、本文を展開しながら読める Response を渡す（2xx 以外は HTTPError）"""
+        stats = {} if stats is None else stats
+        for name, value in STATS.items():
+            stats.setdefault(name, value)
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate", **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            with self._exchange(url, headers, timeout, stats) as resp:
+                if resp.status in REDIRECT_STATUS and resp.headers.get("Location"):
+                    resp.read()
+                    url = urllib.parse.urljoin(url, resp.headers["Location"])
+                    stats["redirects"] += 1
+                    continue
+                if not 200 <= resp.status < 300:
+                    resp.read()
+                    raise HTTPError(url, resp.status, resp.headers)
+                yield Response(resp, url, stats)
+                return
+        raise HTTPError(url, resp.status, resp.headers)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""キーワードの一括照合（Aho–Corasick）
+
+タイトルごとに any(kw in title for kw in KEYWORDS) と全キーワードで部分一致を調べると、
+キーワードが数千語になったときに件数×語数の走査になる。全キーワードから1つのオートマトンを
+作っておけば、タイトルを1回なめるだけで一致したキーワードがすべて取れる。
+照合は検索と同じ正規化（NFKC + 小文字）をした文字列どうしで行う。
+"""
+from collections import deque
+
+from search_index import normalize
+
+
+class KeywordMatcher:
+    """語 -> ラベル の表から作る Aho–Corasick オートマトン
+
+    find() は一致した語のラベルを、本文で見つかった順に重複なく返す。
+    類義語に見出し語のラベルを付けておけば、どちらで一致しても同じラベルになる。
+    """
+
+    def __init__(self, terms):
+        if not isinstance(terms, dict):
+            terms = {term: term for term in terms}
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for term, labels in terms.items():
+            term = normalize(term)
+            if not term:
+                continue
+            state = 0
+            for ch in term:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = self.goto[state][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            labels = (labels,) if isinstance(labels, str) else tuple(labels)
+            self.out[state] += tuple(label for label in labels if label not in self.out[state])
+
+        # 幅優先で失敗リンクを張り、失敗先で一致する語のラベルも引き継ぐ
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.out[self.fail[nxt]]
+                if inherited:
+                    self.out[nxt] += tuple(label for label in inherited if label not in self.out[nxt])
+
+    def find(self, text):
+        """text に含まれる語のラベル（見つかった順、重複なし）"""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = []
+        state = 0
+        node = goto[0]
+        for ch in normalize(text):
+            nxt = node.get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                node = goto[state]
+                nxt = node.get(ch)
+            if nxt is None:
+                continue
+            state = nxt
+            node = goto[state]
+            for label in out[state]:
+                if label not in found:
+                    found.append(label)
+        return found
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""fetch_data.py / build_html.py の計測
+
+段階ごとの所要時間、HTTPリクエストごとの内訳（枠の空き待ち・名前解決・TCP接続・TLS・
+ヘッダー受信・バックオフ・本文の読み込み・パース）、転送量、再試行、キャッシュの当たり、件数、
+ページごとの生成時間を集め、実行の最後に REPORT_DIR へレポートを書き出す。
+    metrics-<名前>.json     今回の実行の詳細
+    metrics-<名前>.prom     同じ内容のOpenMetrics（テキスト形式）
+    metrics-history.jsonl   実行ごとの要約を1行ずつ追記（推移のグラフ用。新しい HISTORY_LIMIT 行だけ残す）
+REPORT_DIR は .gitignore で除いてあり、コミットも公開もされない（CIでは成果物として残す）。
+
+計測は start() した実行に対して行う。start() していなければ何も記録しない。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_DIR = ".metrics"
+HISTORY_PATH = "metrics-history.jsonl"
+HISTORY_LIMIT = 1000
+
+# HTTPリクエストの内訳（http_client.Client.get() の stats と同じ名前）。残りがパースの時間
+PHASES = ("wait", "dns", "connect", "tls", "open", "backoff", "read")
+
+_lock = threading.Lock()
+_run = None
+
+
+class Run:
+    """1回の実行で集めた計測値"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.requests = []
+        self.pages = {}
+
+    def summary(self):
+        """履歴に残す要約"""
+        return {
+            "run": self.name,
+            "started": self.started,
+            "seconds": round(time.perf_counter() - self.t0, 4),
+            "stages": {name: round(s, 4) for name, s in self.stages.items()},
+            "counters": dict(self.counters),
+            "requests": len(self.requests),
+            "bytes": sum(r["bytes"] for r in self.requests),
+            "wire_bytes": sum(r["wire_bytes"] for r in self.requests),
+            "retries": sum(r["retries"] for r in self.requests),
+        }
+
+    def report(self):
+        return {**self.summary(), "http": self.requests, "pages": self.pages}
+
+
+def start(name):
+    """計測を始める（前の実行の記録は捨てる）"""
+    global _run
+    _run = Run(name)
+    return _run
+
+
+def current():
+    return _run
+
+
+@contextmanager
+def stage(name):
+    """with の間の時間を段階 name に足す（並行して同じ段階を測ると合計になる）"""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _run is not None:
+            with _lock:
+                _run.stages[name] = _run.stages.get(name, 0) + time.perf_counter() - t
+
+
+def count(name, n=1):
+    if _run is not None:
+        with _lock:
+            _run.counters[name] = _run.counters.get(name, 0) + n
+
+
+def page(path, seconds):
+    """ページ（またはディレクトリ）1つの生成時間"""
+    if _run is not None:
+        with _lock:
+            _run.pages[path] = round(seconds, 4)
+
+
+@contextmanager
+def request(url):
+    """HTTPリクエスト1回の記録。呼び出し側が渡されたdictに内訳を書き込む
+
+    seconds（全体）は with を抜けたときに入る。例外（304以外）で抜けたら error に例外名が入る。
+    """
+    rec = {"url": url, "status": None, "cache": None, "bytes": 0, "wire_bytes": 0, "retries": 0, "redirects": 0,
+           **{phase: 0.0 for phase in PHASES}, "parse": 0.0, "seconds": 0.0}
+    t = time.perf_counter()
+    try:
+        yield rec
+    except Exception as e:
+        rec["status"] = rec["status"] or getattr(e, "code", None)
+        if rec["status"] != 304:
+            rec["error"] = type(e).__name__
+        raise
+    finally:
+        rec["seconds"] = time.perf_counter() - t
+        if rec["open"] or rec["read"]:
+            rec["parse"] = max(0.0, rec["seconds"] - sum(rec[phase] for phase in PHASES))
+        for key in (*PHASES, "parse", "seconds"):
+            rec[key] = round(rec[key], 4)
+        if _run is not None:
+            with _lock:
+                _run.requests.append(rec)
+
+
+class CountingStream:
+    """読んだバイト数と、読み込みを待った時間を rec に足していくストリーム"""
+
+    def __init__(self, stream, rec):
+        self.stream = stream
+        self.rec = rec
+        self.headers = getattr(stream, "headers", None)
+
+    def read(self, size=-1):
+        t = time.perf_counter()
+        data = self.stream.read(size)
+        self.rec["read"] += time.perf_counter() - t
+        self.rec["bytes"] += len(data)
+        return data
+
+
+def _metric_name(text):
+    return "".join(ch if ch.isalnum() else "_" for ch in text).strip("_").lower()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def openmetrics(run):
+    """OpenMetrics のテキスト形式"""
+    prefix = f"sanpo_{_metric_name(run.name)}"
+    lines = [
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {time.perf_counter() - run.t0:.4f}",
+        f"# TYPE {prefix}_stage_seconds gauge",
+    ]
+    lines += [f'{prefix}_stage_seconds{{stage="{_label(name)}"}} {s:.4f}' for name, s in run.stages.items()]
+    for name, value in sorted(run.counters.items()):
+        metric = f"{prefix}_{_metric_name(name)}"
+        lines += [f"# TYPE {metric} counter", f"{metric}_total {value}"]
+    if run.requests:
+        lines.append(f"# TYPE {prefix}_http_request_seconds gauge")
+        for r in run.requests:
+            for phase in (*PHASES, "parse"):
+                lines.append(f'{prefix}_http_request_seconds{{url="{_label(r["url"])}",phase="{phase}"}} {r[phase]}')
+        lines.append(f"# TYPE {prefix}_http_response_bytes gauge")
+        lines += [f'{prefix}_http_response_bytes{{url="{_label(r["url"])}",status="{r["status"]}",'
+                  f'cache="{r["cache"] or ""}",encoded="{encoded}"}} {r[key]}'
+                  for r in run.requests for key, encoded in (("bytes", "false"), ("wire_bytes", "true"))]
+    if run.pages:
+        lines.append(f"# TYPE {prefix}_page_render_seconds gauge")
+        lines += [f'{prefix}_page_render_seconds{{page="{_label(p)}"}} {s}' for p, s in run.pages.items()]
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _append_history(path, line):
+    """履歴に1行追記する（HISTORY_LIMIT 行を超えた分は古い方から捨てる）"""
+    lines = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    if len(lines) < HISTORY_LIMIT:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    else:
+        _write(path, "".join(lines[len(lines) - HISTORY_LIMIT + 1:]) + line + "\n")
+
+
+def write_report(out_dir=REPORT_DIR):
+    """今回の実行のレポートを書き出し、履歴に要約を追記する。書いたJSONのパスを返す"""
+    if _run is None:
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"metrics-{_run.name}")
+    _write(f"{base}.json", json.dumps(_run.report(), ensure_ascii=False, indent=2))
+    _write(f"{base}.prom", openmetrics(_run))
+    _append_history(os.path.join(out_dir, HISTORY_PATH), json.dumps(_run.summary(), ensure_ascii=False))
+    return f"{base}.json"
+
+
+def format_summary():
+    """ログに出す1行の要約"""
+    if _run is None:
+        return ""
+    s = _run.summary()
+    stages = ", ".join(f"{name} {sec:.2f}s" for name, sec in s["stages"].items())
+    line = f"計測: 合計 {s['seconds']:.2f}s（{stages}）"
+    if s["requests"]:
+        line += f"、HTTP {s['requests']}件 {s['bytes']:,} bytes（転送 {s['wire_bytes']:,} bytes）、再試行 {s['retries']}回"
+    return line
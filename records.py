@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""記事・雑誌・ニュースのレコード
+
+取得（fetch_data.py）・ストア（store.py）・ページ生成（build_html.py）の間を、キーを毎回
+持つ dict ではなく NamedTuple で受け渡す。1件あたりのメモリが dict の数分の一で済み、
+{**a, ...} のコピーも要らない。値を変えるときは _replace() で新しいレコードを作る。
+data.json や条件付きGETのキャッシュとの読み書きには from_dict() / to_dict() を使う。
+"""
+from typing import NamedTuple
+
+
+class Article(NamedTuple):
+    title: str
+    authors: tuple = ()
+    volume: str = ""
+    number: str = ""
+    year: str = ""
+    link: str = ""
+    # RSSの公開日時（dc:date）。APIやdata.jsonから読んだ記事には無い
+    date: str = ""
+
+
+class NewsItem(NamedTuple):
+    title: str
+    link: str = ""
+    date: str = ""
+    source: str = ""
+    # タイトルに含まれていたキーワード（fetch_data.filter_news() が付ける）
+    keywords: tuple = ()
+
+
+class Journal(NamedTuple):
+    id: str
+    name: str
+    publisher: str = ""
+    url: str = ""
+    desc: str = ""
+    # 最新記事（ページ生成用。ストアやdata.jsonから読んだときだけ入る）
+    articles: tuple = ()
+
+
+def from_dict(cls, d):
+    """dict（data.jsonの1件など）からレコードを作る。知らないキーは無視し、リストはタプルにする"""
+    return cls(**{key: tuple(value) if isinstance(value, list) else value
+                  for key, value in d.items() if key in cls._fields})
+
+
+def from_row(cls, row):
+    """JSONに書いたレコード（値の配列）から作り直す"""
+    return cls._make(tuple(value) if isinstance(value, list) else value for value in row)
+
+
+def to_dict(record, keys=None):
+    """data.json に書く dict（keys で項目と順序を指定できる）"""
+    out = {}
+    for key in keys or record._fields:
+        value = getattr(record, key)
+        out[key] = list(value) if isinstance(value, tuple) else value
+    return out
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""search.html 用の転置インデックスを作る
+
+日本語は単語の区切りが無いので、正規化（NFKC + 小文字）したタイトルと著者名の
+文字bigramごとに記事番号のポスティングリストを持つ。検索語のbigramの
+ポスティングを積集合にして候補を絞り、最後に部分一致で確かめる。
+
+インデックスは search/ 以下に分割して書き出し、ページは検索時に必要な分だけ読む。
+    search/manifest.json        分割ファイルの一覧（毎回更新、キャッシュしない）
+    search/shards/grams-N.*.json  ポスティング（bigramのハッシュで振り分け）
+    search/shards/docs-N.*.json   記事本体（記事番号DOC_SHARD_SIZE件ずつ）
+    search/shards/thesaurus.*.json  展開表にしたシソーラス（類義語検索のときだけ読む）
+分割ファイルの名前には内容のハッシュが入るので、長期キャッシュできる。
+"""
+import hashlib
+import json
+import os
+import unicodedata
+
+SEARCH_DIR = "search"
+SHARD_DIR = "shards"
+
+# ポスティング1ファイルの目安サイズと、記事1ファイルの件数
+GRAM_SHARD_BYTES = 64 * 1024
+DOC_SHARD_SIZE = 500
+
+
+def normalize(text):
+    """検索用の正規化（ページ側の normalize() と同じ処理）"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def grams(text):
+    """文字unigramとbigramの集合（1文字の検索語はunigramで引く）"""
+    out = set(text)
+    out.update(text[i:i + 2] for i in range(len(text) - 1))
+    return out
+
+
+def gram_shard(gram, shards):
+    """gramの振り分け先（ページ側の gramShard() と同じ計算）"""
+    h = 0
+    for ch in gram:
+        h = (h * 31 + ord(ch)) % 2**32
+    return h % shards
+
+
+def doc_text(title, authors):
+    """インデックス対象の文字列（ページ側の docText() と同じ組み立て）"""
+    return normalize(title + " " + " ".join(authors))
+
+
+def delta_encode(ids):
+    """昇順の記事番号を差分で持つ（JSONを小さくする）"""
+    out = []
+    prev = 0
+    for i in ids:
+        out.append(i - prev)
+        prev = i
+    return out
+
+
+def build_index(entries):
+    """(雑誌名, 記事 Article) の列から転置インデックスを作る
+
+    docs は [タイトル, 著者, 雑誌番号, 年, 巻, 号, リンク] の配列、
+    grams は gram -> 差分符号化した記事番号の昇順リスト。
+    """
+    journals = []
+    journal_index = {}
+    docs = []
+    postings = {}
+
+    for doc_id, (journal, a) in enumerate(entries):
+        if journal not in journal_index:
+            journal_index[journal] = len(journals)
+            journals.append(journal)
+        docs.append([a.title, a.authors, journal_index[journal], a.year, a.volume, a.number, a.link])
+        for gram in grams(doc_text(a.title, a.authors)):
+            postings.setdefault(gram, []).append(doc_id)
+
+    return {
+        "journals": journals,
+        "docs": docs,
+        "grams": {gram: delta_encode(ids) for gram, ids in sorted(postings.items())},
+    }
+
+
+def compile_thesaurus(thesaurus):
+    """thesaurus.json を検索語 -> 類義語グループの展開表にする
+
+    見出し語と類義語を区別せず、語を共有するエントリは同じグループにまとめる（推移的に閉じる）。
+    語は normalize() したもので比べ、表記は最初に出てきたものを使う。検索語が語の一部でも
+    引けるよう、各語の部分文字列をすべてキーにする。
+    返り値は {"groups": [[語, ...], ...], "expand": {部分文字列: [グループ番号, ...]}}。
+    """
+    parent = {}
+
+    def find(term):
+        while parent[term] != term:
+            parent[term] = parent[parent[term]]
+            term = parent[term]
+        return term
+
+    spelling = {}
+    for key, values in thesaurus.items():
+        terms = [normalize(t) for t in [key, *values] if normalize(t)]
+        for raw, term in zip([key, *values], terms):
+            if term not in parent:
+                parent[term] = term
+                spelling[term] = raw
+        for term in terms[1:]:
+            a, b = find(terms[0]), find(term)
+            if a != b:
+                parent[b] = a
+
+    group_index = {}
+    groups = []
+    for term in parent:
+        root = find(term)
+        if root not in group_index:
+            group_index[root] = len(groups)
+            groups.append([])
+        groups[group_index[root]].append(spelling[term])
+
+    expand = {}
+    for term in parent:
+        gid = group_index[find(term)]
+        for i in range(len(term)):
+            for j in range(i + 1, len(term) + 1):
+                ids = expand.setdefault(term[i:j], [])
+                if gid not in ids:
+                    ids.append(gid)
+    return {"groups": groups, "expand": {sub: sorted(ids) for sub, ids in sorted(expand.items())}}
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _write(path, text):
+    """一時ファイル経由で書く（書きかけのファイルを同名で残さない）"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def build_shards(entries, thesaurus):
+    """インデックスを分割し、(マニフェスト, {ファイル名: 内容}) を返す"""
+    index = build_index(entries)
+    files = {}
+
+    def add(prefix, obj):
+        text = _dumps(obj)
+        name = f"{prefix}.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}.json"
+        files[name] = text
+        return name
+
+    # ポスティングの総量からファイル数（2のべき乗）を決める
+    size = sum(len(gram) + len(_dumps(ids)) + 4 for gram, ids in index["grams"].items())
+    gram_shards = 1
+    while size / gram_shards > GRAM_SHARD_BYTES:
+        gram_shards *= 2
+    buckets = [{} for _ in range(gram_shards)]
+    for gram, ids in index["grams"].items():
+        buckets[gram_shard(gram, gram_shards)][gram] = ids
+
+    docs = index["docs"]
+    manifest = {
+        "journals": index["journals"],
+        "docCount": len(docs),
+        "docShardSize": DOC_SHARD_SIZE,
+        "docShards": [add(f"docs-{i // DOC_SHARD_SIZE}", docs[i:i + DOC_SHARD_SIZE])
+                      for i in range(0, len(docs), DOC_SHARD_SIZE)],
+        "gramShards": [add(f"grams-{i}", bucket) for i, bucket in enumerate(buckets)],
+        "thesaurus": add("thesaurus", compile_thesaurus(thesaurus)),
+    }
+    return manifest, files
+
+
+def write_shards(entries, thesaurus, out_dir=SEARCH_DIR, write=_write):
+    """分割したインデックスを書き出し、使われなくなった古いファイルを消す
+
+    write(path, text) を渡すと書き出しをそれに任せる（build_html.py が圧縮版も置くのに使う）。
+    古いファイルと一緒に、その横にある .gz / .br も消す。
+    """
+    manifest, files = build_shards(entries, thesaurus)
+    shard_dir = os.path.join(out_dir, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    for name, text in files.items():
+        path = os.path.join(shard_dir, name)
+        # 名前が内容のハッシュなので、同名のファイルがあれば書き直さない
+        if not os.path.exists(path):
+            write(path, text)
+    for name in os.listdir(shard_dir):
+        if os.path.splitext(name)[0] not in files and name not in files:
+            os.remove(os.path.join(shard_dir, name))
+
+    write(os.path.join(out_dir, "manifest.json"), _dumps(manifest))
+    return manifest
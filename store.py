@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""記事・ニュースを蓄積するSQLiteストア
+
+fetch_data.py が取得結果を追記（upsert）し、build_html.py が読み出す。
+受け渡しは records.py のレコード（Article / Journal / NewsItem）で行う。
+data.json は export_json() で従来と同じ形に書き出す。
+同じ記事がリンクを変えて入ってきたら（dedup.py で見分ける）、蓄積済みの記事にまとめる。
+"""
+import json
+import os
+import sqlite3
+
+import dedup
+from records import Article, Journal, NewsItem, from_dict, to_dict
+
+# ストアは実行をまたいで残す状態で、サイトには載せない。ドットで始まる .data/ に置いて
+# .gitignore で除き（公開ディレクトリ "." にも入らない）、CI では actions/cache で引き継ぐ。
+# キャッシュが消えても、次の実行でコミット済みの data.json から作り直せる
+DB_PATH = os.path.join(".data", "sanpo.db")
+
+# data.json の雑誌・記事・ニュースが持つキー（この順で書き出す）
+JOURNAL_KEYS = ("id", "name", "publisher", "url", "desc")
+ARTICLE_KEYS = ("title", "authors", "volume", "number", "year", "link")
+NEWS_KEYS = ("title", "link", "date", "source", "keywords")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS journals (
+    id        TEXT PRIMARY KEY,
+    name      TEXT NOT NULL,
+    publisher TEXT NOT NULL DEFAULT '',
+    url       TEXT NOT NULL DEFAULT '',
+    desc      TEXT NOT NULL DEFAULT '',
+    position  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS articles (
+    id         INTEGER PRIMARY KEY,
+    journal_id TEXT NOT NULL REFERENCES journals(id),
+    title      TEXT NOT NULL,
+    volume     TEXT NOT NULL DEFAULT '',
+    number     TEXT NOT NULL DEFAULT '',
+    year       TEXT NOT NULL DEFAULT '',
+    link       TEXT NOT NULL UNIQUE,
+    published  TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS articles_journal ON articles (journal_id, published);
+CREATE INDEX IF NOT EXISTS articles_year ON articles (year);
+CREATE INDEX IF NOT EXISTS articles_volume ON articles (journal_id, volume, number);
+
+CREATE TABLE IF NOT EXISTS authors (
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    position   INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    PRIMARY KEY (article_id, position)
+);
+CREATE INDEX IF NOT EXISTS authors_name ON authors (name);
+
+-- 重複の見分けに使う索引（dedup.py）。記事ID -> 記事、タイトルの帯 -> 記事
+CREATE TABLE IF NOT EXISTS article_idents (
+    ident      TEXT PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS article_idents_article ON article_idents (article_id);
+
+CREATE TABLE IF NOT EXISTS title_bands (
+    band       INTEGER NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, article_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS title_bands_article ON title_bands (article_id);
+
+-- 重複として蓄積済みの記事にまとめたリンク（reason は "id" / "title"）
+CREATE TABLE IF NOT EXISTS article_aliases (
+    link       TEXT PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    reason     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS article_aliases_article ON article_aliases (article_id);
+
+CREATE TABLE IF NOT EXISTS news (
+    id     INTEGER PRIMARY KEY,
+    title  TEXT NOT NULL,
+    link   TEXT NOT NULL UNIQUE,
+    date   TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS news_date ON news (date);
+
+CREATE TABLE IF NOT EXISTS news_keywords (
+    news_id  INTEGER NOT NULL REFERENCES news(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    keyword  TEXT NOT NULL,
+    PRIMARY KEY (news_id, position)
+);
+CREATE INDEX IF NOT EXISTS news_keywords_keyword ON news_keywords (keyword);
+
+CREATE TABLE IF NOT EXISTS harvest_state (
+    journal_id TEXT PRIMARY KEY,
+    next_start INTEGER NOT NULL,
+    total      INTEGER,
+    done       INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    feed TEXT PRIMARY KEY,
+    date TEXT NOT NULL DEFAULT '',
+    link TEXT NOT NULL DEFAULT ''
+);
+
+-- フィードごとの取得の時期（feeds.py）。feed は watermarks と同じキー
+CREATE TABLE IF NOT EXISTS feed_schedule (
+    feed     TEXT PRIMARY KEY,
+    last_run TEXT NOT NULL DEFAULT '',
+    next_run TEXT NOT NULL DEFAULT '',
+    failures INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# 「新しい順」: 公開日（RSSのdc:date、APIのみの記事は発行年）の降順、同日ならフィードでの掲載順
+LATEST_ORDER = "published DESC, id ASC"
+
+# 巻の中の並び: 号の順、同じ号なら公開順
+VOLUME_ORDER = "CAST(number AS INTEGER), number, published, id"
+
+# タイトルのあいまい一致で、帯から引く候補の上限と、類似度を確かめる候補の上限
+# （よくある題名で帯に記事が集まっても、1件あたりの手間が増えないように）
+MAX_CANDIDATES = 200
+MAX_VERIFY = 8
+
+
+def connect(path=DB_PATH):
+    """ストアを開く（無ければ作る）"""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_meta(conn, key, value):
+    with conn:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+def upsert_journals(conn, journals):
+    """雑誌のメタデータを登録・更新する（並び順はリストの順）"""
+    with conn:
+        conn.executemany(
+            '''INSERT INTO journals (id, name, publisher, url, desc, position)
+               VALUES (:id, :name, :publisher, :url, :desc, :position)
+               ON CONFLICT(id) DO UPDATE SET
+                 name = excluded.name, publisher = excluded.publisher,
+                 url = excluded.url, desc = excluded.desc, position = excluded.position''',
+            [{**to_dict(j, JOURNAL_KEYS), "position": i} for i, j in enumerate(journals)],
+        )
+
+
+def upsert_articles(conn, journal_id, articles, stats=None):
+    """記事をリンクをキーに登録・更新し、新規に追加された件数を返す
+
+    リンクが初めてでも、蓄積済みの記事と同じ記事（dedup.py）なら新しく登録せず、その記事の
+    欠けている項目を補ってリンクを別名として覚える。stats（dict）を渡すと、まとめた件数を
+    理由（"id" / "title"）ごとに足し込む。
+    """
+    added = 0
+    with conn:
+        for a in articles:
+            link = a.link
+            if not link:
+                continue
+            published = a.date or a.year
+            row = conn.execute("SELECT id, title FROM articles WHERE link = ?", (link,)).fetchone()
+            if row is None:
+                keys = _dedup_keys(link, a.title)
+                article_id, reason = _duplicate_of(conn, journal_id, link, keys)
+                if article_id is not None:
+                    _merge_article(conn, article_id, a, published, keys[0])
+                    cur = conn.execute(
+                        "INSERT OR IGNORE INTO article_aliases (link, article_id, reason) VALUES (?, ?, ?)",
+                        (link, article_id, reason),
+                    )
+                    # 前の取得で別名にしたリンク（同じフィードを読み直したとき）は数えない
+                    if stats is not None and cur.rowcount:
+                        stats[reason] = stats.get(reason, 0) + 1
+                    continue
+            cur = conn.execute(
+                '''INSERT INTO articles (journal_id, title, volume, number, year, link, published)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(link) DO UPDATE SET
+                     title = excluded.title,
+                     volume = COALESCE(NULLIF(excluded.volume, ''), articles.volume),
+                     number = COALESCE(NULLIF(excluded.number, ''), articles.number),
+                     year = COALESCE(NULLIF(excluded.year, ''), articles.year),
+                     published = CASE WHEN length(excluded.published) > length(articles.published)
+                                      THEN excluded.published ELSE articles.published END''',
+                (journal_id, a.title, a.volume, a.number, a.year, link, published),
+            )
+            if row is None:
+                article_id = cur.lastrowid
+                added += 1
+                _index_article(conn, article_id, keys, new=True)
+            else:
+                article_id = row["id"]
+                if row["title"] != a.title:
+                    _index_article(conn, article_id, _dedup_keys(link, a.title))
+            if a.authors:
+                _set_authors(conn, article_id, a.authors)
+    return added
+
+
+def _set_authors(conn, article_id, authors):
+    conn.execute("DELETE FROM authors WHERE article_id = ?", (article_id,))
+    conn.executemany(
+        "INSERT INTO authors (article_id, position, name) VALUES (?, ?, ?)",
+        [(article_id, i, name) for i, name in enumerate(authors)],
+    )
+
+
+def _dedup_keys(link, title):
+    """(記事ID, タイトルのshingle集合, タイトルの帯のキー, 続きものの番号)"""
+    grams = dedup.shingles(title)
+    return dedup.article_ident(link), grams, dedup.bands(dedup.signature(grams)), dedup.parts(title)
+
+
+def _index_article(conn, article_id, keys, new=False):
+    ident, _, bands, _ = keys
+    if ident:
+        conn.execute("INSERT OR IGNORE INTO article_idents (ident, article_id) VALUES (?, ?)", (ident, article_id))
+    if not new:
+        conn.execute("DELETE FROM title_bands WHERE article_id = ?", (article_id,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO title_bands (band, article_id) VALUES (?, ?)",
+        [(band, article_id) for band in bands],
+    )
+
+
+def _duplicate_of(conn, journal_id, link, keys):
+    """同じ記事とみなせる蓄積済みの記事の (ID, 理由)。無ければ (None, None)"""
+    row = conn.execute("SELECT article_id, reason FROM article_aliases WHERE link = ?", (link,)).fetchone()
+    if row:
+        return row["article_id"], row["reason"]
+    ident, grams, bands, parts = keys
+    if ident:
+        row = conn.execute("SELECT article_id FROM article_idents WHERE ident = ?", (ident,)).fetchone()
+        if row:
+            return row["article_id"], "id"
+    if not bands:
+        return None, None
+    # 帯が MIN_BANDS 本以上一致した記事を一致の多い順に、同じ雑誌のものだけ shingle の類似度で確かめる
+    marks = ",".join("?" * len(bands))
+    ids = [row[0] for row in conn.execute(
+        f'''SELECT article_id FROM (SELECT article_id FROM title_bands WHERE band IN ({marks}) LIMIT ?)
+            GROUP BY article_id HAVING count(*) >= ? ORDER BY count(*) DESC LIMIT ?''',
+        (*bands, MAX_CANDIDATES, dedup.MIN_BANDS, MAX_VERIFY),
+    )]
+    if not ids:
+        return None, None
+    best, best_score = None, dedup.TITLE_THRESHOLD
+    for row in conn.execute(
+        f"SELECT id, title, link FROM articles WHERE id IN ({','.join('?' * len(ids))}) AND journal_id = ?",
+        (*ids, journal_id),
+    ):
+        if not dedup.compatible(ident, dedup.article_ident(row["link"])) or dedup.parts(row["title"]) != parts:
+            continue
+        score = dedup.similarity(grams, dedup.shingles(row["title"]))
+        if score >= best_score:
+            best, best_score = row["id"], score
+    return (best, "title") if best is not None else (None, None)
+
+
+def _merge_article(conn, article_id, a, published, ident):
+    """重複していた記事 a の巻号・公開日・著者で蓄積済みの記事の欠けている項目を補い、a の記事IDも引けるようにする"""
+    conn.execute(
+        '''UPDATE articles SET
+             volume = COALESCE(NULLIF(?, ''), volume),
+             number = COALESCE(NULLIF(?, ''), number),
+             year = COALESCE(NULLIF(?, ''), year),
+             published = CASE WHEN length(?) > length(published) THEN ? ELSE published END
+           WHERE id = ?''',
+        (a.volume, a.number, a.year, published, published, article_id),
+    )
+    if a.authors and not conn.execute("SELECT 1 FROM authors WHERE article_id = ?", (article_id,)).fetchone():
+        _set_authors(conn, article_id, a.authors)
+    if ident:
+        conn.execute("INSERT OR IGNORE INTO article_idents (ident, article_id) VALUES (?, ?)", (ident, article_id))
+
+
+def reindex_articles(conn, batch_size=1000, stats=None):
+    """重複の索引を全記事について作り直す（dedup.VERSION が変わったとき、索引の無いストア用）
+
+    蓄積済みの記事どうしで重複していたものは、先に登録した記事にまとめて後の方を消す。
+    まとめた件数を返す（stats を渡すと理由ごとにも足し込む）。
+    """
+    merged = 0
+    last = 0
+    with conn:
+        conn.execute("DELETE FROM article_idents")
+        conn.execute("DELETE FROM title_bands")
+        while True:
+            rows = conn.execute("SELECT * FROM articles WHERE id > ? ORDER BY id LIMIT ?", (last, batch_size)).fetchall()
+            if not rows:
+                break
+            last = rows[-1]["id"]
+            for row, a in zip(rows, _articles(conn, rows)):
+                keys = _dedup_keys(a.link, a.title)
+                target, reason = _duplicate_of(conn, row["journal_id"], a.link, keys)
+                if target is None or target == row["id"]:
+                    _index_article(conn, row["id"], keys, new=True)
+                    continue
+                _merge_article(conn, target, a, row["published"], keys[0])
+                conn.execute("UPDATE article_aliases SET article_id = ? WHERE article_id = ?", (target, row["id"]))
+                conn.execute(
+                    "INSERT OR REPLACE INTO article_aliases (link, article_id, reason) VALUES (?, ?, ?)",
+                    (a.link, target, reason),
+                )
+                conn.execute("DELETE FROM articles WHERE id = ?", (row["id"],))
+                merged += 1
+                if stats is not None:
+                    stats[reason] = stats.get(reason, 0) + 1
+    return merged
+
+
+def count_duplicates(conn):
+    """これまでに重複としてまとめたリンクの数（理由ごと）"""
+    return {row["reason"]: row["n"] for row in conn.execute(
+        "SELECT reason, count(*) AS n FROM article_aliases GROUP BY reason ORDER BY reason")}
+
+
+def upsert_news(conn, items):
+    """ニュースをリンクをキーに登録・更新する（一致したキーワードも置き換える）。新しく入った件数を返す"""
+    items = [item for item in items if item.link]
+    with conn:
+        added = len({item.link for item in items
+                     if conn.execute("SELECT 1 FROM news WHERE link = ?", (item.link,)).fetchone() is None})
+        conn.executemany(
+            '''INSERT INTO news (title, link, date, source) VALUES (?, ?, ?, ?)
+               ON CONFLICT(link) DO UPDATE SET
+                 title = excluded.title, date = excluded.date, source = excluded.source''',
+            [(item.title, item.link, item.date, item.source) for item in items],
+        )
+        for item in items:
+            news_id = conn.execute("SELECT id FROM news WHERE link = ?", (item.link,)).fetchone()["id"]
+            _set_news_keywords(conn, news_id, item.keywords)
+    return added
+
+
+def _set_news_keywords(conn, news_id, keywords):
+    conn.execute("DELETE FROM news_keywords WHERE news_id = ?", (news_id,))
+    conn.executemany(
+        "INSERT INTO news_keywords (news_id, position, keyword) VALUES (?, ?, ?)",
+        [(news_id, i, keyword) for i, keyword in enumerate(keywords)],
+    )
+
+
+def retag_news(conn, find):
+    """蓄積した全ニュースのキーワードを find(タイトル) で付け直す（キーワードの表を変えたとき用）"""
+    with conn:
+        for row in conn.execute("SELECT id, title FROM news").fetchall():
+            _set_news_keywords(conn, row["id"], find(row["title"]))
+
+
+def _news_keywords(conn, news_ids):
+    """ニュースID -> 一致したキーワードのリスト"""
+    keywords = {i: [] for i in news_ids}
+    if news_ids:
+        marks = ",".join("?" * len(news_ids))
+        for row in conn.execute(
+            f"SELECT news_id, keyword FROM news_keywords WHERE news_id IN ({marks}) ORDER BY news_id, position",
+            list(news_ids),
+        ):
+            keywords[row["news_id"]].append(row["keyword"])
+    return keywords
+
+
+def _authors(conn, article_ids):
+    """記事ID -> 著者リスト"""
+    authors = {i: [] for i in article_ids}
+    if article_ids:
+        marks = ",".join("?" * len(article_ids))
+        for row in conn.execute(
+            f"SELECT article_id, name FROM authors WHERE article_id IN ({marks}) ORDER BY article_id, position",
+            list(article_ids),
+        ):
+            authors[row["article_id"]].append(row["name"])
+    return authors
+
+
+def _articles(conn, rows):
+    authors = _authors(conn, [row["id"] for row in rows])
+    return [
+        Article(row["title"], tuple(authors[row["id"]]), row["volume"], row["number"], row["year"], row["link"])
+        for row in rows
+    ]
+
+
+def journals(conn):
+    """雑誌のメタデータを登録順に返す"""
+    return [
+        Journal(row["id"], row["name"], row["publisher"], row["url"], row["desc"])
+        for row in conn.execute("SELECT * FROM journals ORDER BY position")
+    ]
+
+
+def latest_articles(conn, journal_id, limit=5):
+    """雑誌の最新記事を新しい順にlimit件"""
+    rows = conn.execute(
+        f"SELECT * FROM articles WHERE journal_id = ? ORDER BY {LATEST_ORDER} LIMIT ?",
+        (journal_id, limit),
+    ).fetchall()
+    return _articles(conn, rows)
+
+
+def iter_articles(conn, journal_id=None, volume=None, batch_size=1000):
+    """記事を新しい順（巻を指定したら号の順）に少しずつ読み出す（全件をメモリに載せない）"""
+    if journal_id is None:
+        cur = conn.execute(
+            f'''SELECT articles.* FROM articles JOIN journals ON journals.id = articles.journal_id
+                ORDER BY journals.position, {LATEST_ORDER}''')
+    elif volume is None:
+        cur = conn.execute(f"SELECT * FROM articles WHERE journal_id = ? ORDER BY {LATEST_ORDER}", (journal_id,))
+    else:
+        cur = conn.execute(
+            f"SELECT * FROM articles WHERE journal_id = ? AND volume = ? ORDER BY {VOLUME_ORDER}",
+            (journal_id, volume),
+        )
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        for row, article in zip(rows, _articles(conn, rows)):
+            yield row["journal_id"], article
+
+
+def count_articles(conn, journal_id):
+    return conn.execute("SELECT count(*) FROM articles WHERE journal_id = ?", (journal_id,)).fetchone()[0]
+
+
+def volumes(conn, journal_id):
+    """雑誌の巻と記事数を新しい巻から [(巻, 件数), ...]（巻の無い記事は除く）"""
+    return [
+        (row["volume"], row["n"])
+        for row in conn.execute(
+            '''SELECT volume, count(*) AS n FROM articles WHERE journal_id = ? AND volume != ''
+               GROUP BY volume ORDER BY CAST(volume AS INTEGER) DESC, volume DESC''',
+            (journal_id,),
+        )
+    ]
+
+
+def latest_news(conn, limit=10):
+    rows = conn.execute("SELECT * FROM news ORDER BY date DESC, id ASC LIMIT ?", (limit,)).fetchall()
+    keywords = _news_keywords(conn, [row["id"] for row in rows])
+    return [NewsItem(row["title"], row["link"], row["date"], row["source"], tuple(keywords[row["id"]])) for row in rows]
+
+
+def get_harvest_state(conn, journal_id):
+    row = conn.execute("SELECT * FROM harvest_state WHERE journal_id = ?", (journal_id,)).fetchone()
+    if not row:
+        return {"next_start": 1, "total": None, "done": False}
+    return {"next_start": row["next_start"], "total": row["total"], "done": bool(row["done"])}
+
+
+def set_harvest_state(conn, journal_id, next_start, total, done):
+    with conn:
+        conn.execute(
+            '''INSERT INTO harvest_state (journal_id, next_start, total, done) VALUES (?, ?, ?, ?)
+               ON CONFLICT(journal_id) DO UPDATE SET
+                 next_start = excluded.next_start, total = excluded.total, done = excluded.done''',
+            (journal_id, next_start, total, int(done)),
+        )
+
+
+def get_watermark(conn, feed):
+    """フィード（雑誌IDまたはRSSのURL）で前回取得した最新項目の {"date", "link"}"""
+    row = conn.execute("SELECT date, link FROM watermarks WHERE feed = ?", (feed,)).fetchone()
+    return {"date": row["date"], "link": row["link"]} if row else None
+
+
+def set_watermark(conn, feed, date, link):
+    with conn:
+        conn.execute(
+            '''INSERT INTO watermarks (feed, date, link) VALUES (?, ?, ?)
+               ON CONFLICT(feed) DO UPDATE SET date = excluded.date, link = excluded.link''',
+            (feed, date, link),
+        )
+
+
+def get_schedule(conn):
+    """フィード -> {"last_run", "next_run", "failures"}（取得したことのあるフィードだけ）"""
+    return {
+        row["feed"]: {"last_run": row["last_run"], "next_run": row["next_run"], "failures": row["failures"]}
+        for row in conn.execute("SELECT * FROM feed_schedule")
+    }
+
+
+def set_schedule(conn, feed, last_run, next_run, failures=0):
+    with conn:
+        conn.execute(
+            '''INSERT INTO feed_schedule (feed, last_run, next_run, failures) VALUES (?, ?, ?, ?)
+               ON CONFLICT(feed) DO UPDATE SET
+                 last_run = excluded.last_run, next_run = excluded.next_run, failures = excluded.failures''',
+            (feed, last_run, next_run, failures),
+        )
+
+
+def export_data(conn, articles_per_journal=5, news_limit=10):
+    """ページ生成に使うデータ（data.json と同じ構成。雑誌・記事・ニュースはレコード）"""
+    return {
+        "updated": get_meta(conn, "updated", ""),
+        "journals": [
+            j._replace(articles=tuple(latest_articles(conn, j.id, articles_per_journal)))
+            for j in journals(conn)
+        ],
+        "news": latest_news(conn, news_limit),
+    }
+
+
+def data_to_json(data):
+    """export_data() / load_json() の結果を data.json に書く dict にする"""
+    return {
+        "updated": data["updated"],
+        "journals": [
+            {**to_dict(j, JOURNAL_KEYS), "articles": [to_dict(a, ARTICLE_KEYS) for a in j.articles]}
+            for j in data["journals"]
+        ],
+        "news": [to_dict(item, NEWS_KEYS) for item in data["news"]],
+    }
+
+
+def load_json(path="data.json"):
+    """data.json を読み、export_data() と同じ形（レコード）にして返す"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        "updated": data.get("updated", ""),
+        "journals": [
+            from_dict(Journal, {**j, "articles": [from_dict(Article, a) for a in j.get("articles", [])]})
+            for j in data.get("journals", [])
+        ],
+        "news": [from_dict(NewsItem, item) for item in data.get("news", [])],
+    }
+
+
+def export_json(conn, path="data.json"):
+    """data.json を書き出す（一時ファイル経由で置き換え）"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data_to_json(export_data(conn)), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def import_json(conn, path="data.json"):
+    """既存のdata.jsonを取り込む（ストアを初めて作ったときの移行用）"""
+    data = load_json(path)
+    upsert_journals(conn, data["journals"])
+    for j in data["journals"]:
+        upsert_articles(conn, j.id, j.articles)
+    upsert_news(conn, data["news"])
+    if data["updated"]:
+        set_meta(conn, "updated", data["updated"])
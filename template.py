@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""build_html.py 用の小さなテンプレート
+
+str.format と同じ {name} の書式を最初に一度だけ文字列とフィールドに分けておき、
+描画は値を差し込んで join するだけにする。一覧は行ごとに描いて最後に1回 join する
+（+= で伸ばしていくと件数の2乗で遅くなる）。
+"""
+import string
+
+
+class Template:
+    """{name} の場所で区切ったテンプレート
+
+    fragments に渡した名前は作るときに埋め込んでしまう（アイコンなど毎回同じ断片）。
+    """
+
+    def __init__(self, source, **fragments):
+        self.literals = []
+        self.fields = []
+        literal = ""
+        for text, field, spec, conversion in string.Formatter().parse(source):
+            literal += text
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(f"書式指定は使えません: {{{field}}}")
+            if field in fragments:
+                literal += str(fragments[field])
+                continue
+            self.literals.append(literal)
+            self.fields.append(field)
+            literal = ""
+        self.literals.append(literal)
+
+    def render(self, values=None, **kwargs):
+        """値を差し込んだ文字列"""
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = {**values, **kwargs}
+        out = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            out.append(str(values[field]))
+            out.append(literal)
+        return "".join(out)
+
+    def render_each(self, rows):
+        """行ごとに描いて join する"""
+        return "".join([self.render(row) for row in rows])
+
+
+class FragmentCache:
+    """描画済みの断片をキーで覚えておく（同じ記事の行を一覧・巻・トップページで使い回す）"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._items = {}
+
+    def get(self, key, render):
+        """key の断片を返す（無ければ render() で作って覚える）"""
+        html = self._items.get(key)
+        if html is None:
+            if len(self._items) >= self.maxsize:
+                self._items.clear()
+            html = self._items[key] = render()
+        return html
+
+    def clear(self):
+        self._items.clear()